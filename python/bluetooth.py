@@ -13,26 +13,45 @@ method. It initializes the BluetoothManager with the given device name, MAC addr
 - connect_by_device_name(self): This method connects to a Bluetooth device by its name. It returns the MAC address of
 the device if found, None otherwise.
 
+- find_device_by_name(self, timeout): This method scans for the device with the given name and returns as soon as it
+is found.
+
+- _get_scanner(self): This method returns the scanner shared by all scans of the manager, creating it on the event
+loop the first time it is needed.
+
+- _on_adv(self, device, advertisement_data): This method is the detection callback of the shared scanner. It caches
+each advertisement and signals find_device_by_name when the wanted device is seen.
+
+- connect_client(self): This method connects the BleakClient, falling back to a scan by device name if a cached MAC
+address no longer works.
+
 - connect_and_start_notifications(self): This method connects to a Bluetooth device and starts receiving
 notifications. If the MAC address is not provided, it attempts to connect by device name.
 
-- wait_for_notifications(self): This method keeps the connection alive and waits for notifications.
+- wait_for_notifications(self): This method keeps the connection alive and waits for notifications until the
+connection is shut down.
 
-- notification_handler(self, sender, data): This method handles incoming notifications. It processes the data
-received in the notification.
+- notification_handler(self, sender, data): This method handles incoming notifications. It forwards them to the
+handler selected by rebind_handler, which queues the whole notification payload for _consumer while the UI is
+receiving data and drops it otherwise.
+
+- rebind_handler(self, active): This method selects the notification handler when data receiving is toggled.
+
+- _consumer(self): This task parses the notification payloads queued by the notification handler.
 
 - cleanup(self): This method cleans up the connection and stops notifications.
 
-- start_scan(self): This method starts a scan for Bluetooth devices in a background thread.
+- start_scan(self): This method starts a scan for Bluetooth devices on the shared background event loop.
 
 - scan_for_devices(self): This method asynchronously scans for Bluetooth devices and updates the scan results in the UI.
 
 - start(self): This method starts the BluetoothManager, connects to a device, and starts receiving notifications.
 
-- shut(self): This method asynchronously shuts down the event loop safely. It returns True if the connection was
+- shut(self): This method asynchronously shuts down the connection safely. It returns True if the connection was
 closed successfully, False otherwise.
 
-- stop(self): This method stops the manager and disconnects.
+- stop(self): This method stops the manager and disconnects without blocking. The result is reported to the UI by
+_on_shut_done, or by _on_shut_timeout if the disconnect takes too long.
 
 To use this script, you need to create an instance of the BluetoothManager class, passing the device name,
 MAC address, UUID, user interface, and dialog to the constructor. Then, you can use the start method to start the
@@ -40,8 +59,66 @@ Bluetooth communication, the stop method to stop it, and the start_scan method t
 """
 
 import asyncio
-from process_data import process_data
+import json
+import logging
+import os
+import pathlib
+import threading
+from uuid import UUID
+from process_data import process_data_bulk
 from bleak import BleakClient, BleakScanner
+from bleak.exc import BleakError
+
+try:
+    # uvloop dispatches callbacks and timers faster than the default selector loop; it is not available on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
+
+log = logging.getLogger(__name__)
+
+SCAN_TIMEOUT = 10  # Maximum number of seconds to scan for a named device
+SCAN_WINDOW = 5  # Number of seconds to scan for when listing all devices
+STOP_TIMEOUT = 10  # Maximum number of seconds to wait for a disconnect
+RX_QUEUE_SIZE = 64  # Maximum number of notifications waiting to be parsed
+DEVICE_NAME_UUID = UUID('00002a00-0000-1000-8000-00805f9b34fb')  # GATT Device Name characteristic, parsed once
+_MAC_CACHE_PATH = pathlib.Path("~/.cache/ecg_spo2/mac.json").expanduser()  # {device_name: mac_address}
+
+# One event loop shared by every BluetoothManager, running in its own daemon thread for the life of the process
+_BG_LOOP = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+threading.Thread(target=_BG_LOOP.run_forever, name="BluetoothEventLoopThread", daemon=True).start()
+
+
+def load_mac_cache():
+    """
+    Load the device name to MAC address mapping saved by earlier sessions.
+
+    Returns:
+    - The cached mapping, or an empty dict if there is no usable cache file.
+    """
+    try:
+        with open(_MAC_CACHE_PATH) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_mac_cache(cache):
+    """
+    Atomically write the device name to MAC address mapping to disk.
+
+    Parameters:
+    - cache: The mapping to save.
+    """
+    try:
+        _MAC_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _MAC_CACHE_PATH.with_suffix(".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(cache, file)
+        os.replace(tmp_path, _MAC_CACHE_PATH)
+    except OSError as e:
+        log.warning("Failed to save MAC address cache: %s", e)
 
 
 class BluetoothManager:
@@ -65,9 +142,28 @@ class BluetoothManager:
         self.uuid = uuid
         self.ui = ui
         self.dialog = dialog
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
+        self.loop = _BG_LOOP
         self.client = None
+        self._stop_event = None
+        self._cleaned = False
+        self._is_connected = False
+        self._rx_q = None  # Notification payloads waiting for _consumer, created on the event loop when connected
+        self._current_handler = self._noop_handler
+        if ui is not None:
+            self.rebind_handler(ui.is_receiving_data)
+        # Reuse the MAC address a named device had last time so reconnecting does not need a scan
+        self._mac_from_cache = False
+        if not self.mac_address and self.device_name:
+            cached_mac = load_mac_cache().get(self.device_name)
+            if cached_mac:
+                self.mac_address = cached_mac
+                self._mac_from_cache = True
+        # A single scanner is reused for every scan; its callback keeps the latest advertisement of each address
+        self._adv_cache = {}
+        self._seen_adv = set()  # (address, name, RSSI bucket, manufacturer data count) seen during the current scan
+        self._found_device = None
+        self._name_found = None
+        self._scanner = None  # Created by _get_scanner on the event loop, some backends need a running loop
 
     async def connect_by_device_name(self):
         """
@@ -76,14 +172,133 @@ class BluetoothManager:
         Returns:
         - The MAC address of the device if found, None otherwise.
         """
-        devices = await BleakScanner.discover()
-        for device in devices:
-            if device.name == self.device_name:
-                print(f"Found device with name {self.device_name}: {device.address}")
-                return device.address
-        print(f"No device with name {self.device_name} found.")
+        device = await self.find_device_by_name()
+        if device:
+            log.info("Found device with name %s: %s", self.device_name, device.address)
+            return device.address
+        log.info("No device with name %s found.", self.device_name)
         return None
 
+    async def find_device_by_name(self, timeout=SCAN_TIMEOUT):
+        """
+        Scan for the device named self.device_name, stopping as soon as its first advertisement is seen instead of
+        waiting for the whole scan window.
+
+        Parameters:
+        - timeout: The maximum number of seconds to scan for.
+
+        Returns:
+        - The BLEDevice if found within the timeout, None otherwise.
+        """
+        self._found_device = None
+        self._name_found = asyncio.Event()
+        self._seen_adv.clear()
+        scanner = self._get_scanner()
+        await scanner.start()
+        try:
+            await asyncio.wait_for(self._name_found.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            await scanner.stop()
+            self._name_found = None
+        return self._found_device
+
+    def _get_scanner(self):
+        """
+        Get the scanner shared by all scans of this manager, creating it on first use. Only called from coroutines
+        on the background event loop, since the CoreBluetooth backend needs a running event loop to create it.
+
+        Returns:
+        - The BleakScanner with _on_adv as its detection callback.
+        """
+        if self._scanner is None:
+            self._scanner = BleakScanner(detection_callback=self._on_adv)
+        return self._scanner
+
+    def _on_adv(self, device, advertisement_data):
+        """
+        Detection callback of the shared scanner. Records every advertisement in the advertisement cache and wakes up
+        find_device_by_name when the wanted device is seen.
+
+        Parameters:
+        - device: The BLEDevice that sent the advertisement.
+        - advertisement_data: The advertisement data received.
+        """
+        # BlueZ repeats advertisements many times per second; only handle those that differ noticeably
+        key = (device.address, advertisement_data.local_name, advertisement_data.rssi // 5,
+               len(advertisement_data.manufacturer_data))
+        if key in self._seen_adv:
+            return
+        self._seen_adv.add(key)
+        self._adv_cache[device.address.upper()] = (device, advertisement_data)
+        if self._name_found is not None and device.name == self.device_name:
+            self._found_device = device
+            self._name_found.set()
+
+    async def connect_client(self):
+        """
+        Create a BleakClient for the MAC address and connect to it.
+
+        If the MAC address came from the cache and the connection fails, the cache entry is dropped and the device is
+        looked up by name again.
+
+        Returns:
+        - True if the client is connected, False otherwise.
+        """
+        self.client = BleakClient(self._client_target(), disconnected_callback=self._on_disconnected)
+        if not self._mac_from_cache:
+            return await self._connect()
+
+        try:
+            if await self._connect():
+                return True
+        except (BleakError, asyncio.TimeoutError, OSError) as e:
+            # A stale cached address may also time out or fail in the backend, drop it in every case
+            log.warning("Cached address %s failed: %s", self.mac_address, e)
+        cache = load_mac_cache()
+        cache.pop(self.device_name, None)
+        save_mac_cache(cache)
+        self._mac_from_cache = False
+
+        self.mac_address = await self.connect_by_device_name()
+        if self.mac_address is None:
+            return False
+        self.client = BleakClient(self._client_target(), disconnected_callback=self._on_disconnected)
+        return await self._connect()
+
+    async def _connect(self):
+        """
+        Connect the client and remember the connection state, so it does not have to be queried from Bleak (a DBus
+        call on Linux) later on.
+
+        Returns:
+        - True if the client is connected, False otherwise.
+        """
+        # Bleak before 1.0 returns a bool, later versions return None and raise if the connection fails
+        self._is_connected = await self.client.connect() is not False
+        return self._is_connected
+
+    def _on_disconnected(self, client):
+        """
+        Disconnected callback of the BleakClient, also called when the device drops the connection.
+
+        Parameters:
+        - client: The BleakClient that was disconnected.
+        """
+        self._is_connected = False
+
+    def _client_target(self):
+        """
+        Get what the BleakClient should be created from. Passing the BLEDevice seen during a scan lets Bleak skip
+        resolving the address again, which on some platforms means another scan.
+
+        Returns:
+        - The cached BLEDevice for the MAC address if one was seen, otherwise the MAC address itself.
+        """
+        entry = self._adv_cache.get(self.mac_address.upper())
+        return entry[0] if entry else self.mac_address
+
     async def connect_and_start_notifications(self):
         """
         Connect to a Bluetooth device and start receiving notifications.
@@ -98,36 +313,62 @@ class BluetoothManager:
                 return
 
         if self.mac_address:
-            self.client = BleakClient(self.mac_address, loop=self.loop)
             try:
-                if await self.client.connect():
+                if await self.connect_client():
+                    consumer = None
+                    name_task = None
                     try:
-                        device_name = await self.client.read_gatt_char('00002a00-0000-1000-8000-00805f9b34fb')
-                        device_name = device_name.decode('utf-8')
-                    except Exception as e:
-                        device_name = "Unknown Device"
-                    message = f"Successfully connected to address:{self.mac_address} name:({device_name})"
-                    self.dialog.update_status_signal.emit(message)
-                    self.ui.ble_status_signal.emit(f"BLE connected on {device_name}", "green")
-                    await asyncio.sleep(2)
-                    await self.client.start_notify(self.uuid, self.notification_handler)
-                    await self.wait_for_notifications()
+                        if self.device_name and not self._mac_from_cache:
+                            cache = load_mac_cache()
+                            cache[self.device_name] = self.mac_address
+                            save_mac_cache(cache)
+                        # Use the name we searched for or the one in the advertisement, reading it over GATT only if
+                        # neither is known. The read is issued together with start_notify instead of before it.
+                        entry = self._adv_cache.get(self.mac_address.upper())
+                        device_name = self.device_name or (entry[0].name if entry else None)
+                        if not device_name:
+                            name_task = asyncio.create_task(self.client.read_gatt_char(DEVICE_NAME_UUID))
+                        self._stop_event = asyncio.Event()
+                        self._cleaned = False
+                        self._rx_q = asyncio.Queue(maxsize=RX_QUEUE_SIZE)
+                        consumer = asyncio.create_task(self._consumer())
+                        await self.client.start_notify(self.uuid, self.notification_handler)
+                        if name_task:
+                            try:
+                                device_name = (await name_task).decode('utf-8', 'replace')
+                            except Exception as e:
+                                log.warning("Device name read failed: %s", e)
+                                device_name = "Unknown Device"
+                        message = f"Successfully connected to address:{self.mac_address} name:({device_name})"
+                        self.dialog.update_status_signal.emit(message)
+                        self.ui.ble_status_signal.emit(f"BLE connected on {device_name}", "green")
+                        await self.wait_for_notifications()
+                    finally:
+                        if name_task:
+                            # A read still pending because start_notify failed must not outlive the connection
+                            name_task.cancel()
+                            await asyncio.gather(name_task, return_exceptions=True)
+                        if consumer:
+                            consumer.cancel()
+                            # Let the consumer finish unwinding before the connection is torn down
+                            await asyncio.gather(consumer, return_exceptions=True)
+                        # Like leaving an "async with BleakClient" block, never leave the connection open on the way out
+                        if self._is_connected:
+                            await self.client.disconnect()
+                            self._is_connected = False
                 else:
                     self.dialog.update_status_signal.emit(f"Failed to connect to {self.mac_address}")
-                    await asyncio.sleep(2)
             except Exception as e:
                 self.dialog.update_status_signal.emit(f"Connection failed: {str(e)}")
-                await asyncio.sleep(2)
 
     async def wait_for_notifications(self):
         """
-        Keep the connection alive and wait for notifications.
+        Keep the connection alive and wait for notifications until cleanup or shut sets the stop event.
         """
         try:
-            while True:
-                await asyncio.sleep(3600)  # Keep the connection alive
+            await self._stop_event.wait()
         except asyncio.CancelledError:
-            print("Notification handling canceled.")
+            log.debug("Notification handling canceled.")
 
     def notification_handler(self, sender, data):
         """
@@ -137,89 +378,187 @@ class BluetoothManager:
         - sender: The sender of the notification.
         - data: The data received in the notification.
         """
-        for byte in data:
-            if self.ui.is_receiving_data:
-                if not self.ui.is_serial_connected:
-                    process_data(byte, self.ui)
-                elif self.ui.is_serial_connected and self.ui.using_ble:
-                    process_data(byte, self.ui)
+        self._current_handler(sender, data)
+
+    def rebind_handler(self, active):
+        """
+        Select the handler notification_handler forwards to. Called by the UI whenever data receiving is toggled,
+        so that idle notifications return immediately without looking at the UI state.
+
+        Parameters:
+        - active: True if the UI is receiving data, False otherwise.
+        """
+        self._current_handler = self._active_handler if active else self._noop_handler
+
+    def _noop_handler(self, sender, data):
+        """
+        Discard a notification while the UI is not receiving data.
+        """
+        pass
+
+    def _active_handler(self, sender, data):
+        """
+        Queue a notification for _consumer unless the UI is using the serial connection as its data source. Only the
+        payload is copied here, so the callback returns without waiting for the parsing.
+
+        Parameters:
+        - sender: The sender of the notification.
+        - data: The data received in the notification.
+        """
+        # The UI flags cannot change while a single notification is handled, so read them once
+        ui = self.ui
+        ser = ui.is_serial_connected
+        ble = ui.using_ble
+        if ser and not ble:
+            return
+        self.loop.call_soon_threadsafe(self._enqueue, bytes(data))
+
+    def _enqueue(self, data):
+        """
+        Put a notification payload in the receive queue, dropping the oldest one if the consumer has fallen behind.
+
+        Parameters:
+        - data: The payload of the notification.
+        """
+        if self._rx_q.full():
+            self._rx_q.get_nowait()
+            log.debug("Receive queue full, dropped the oldest notification.")
+        self._rx_q.put_nowait(data)
+
+    async def _consumer(self):
+        """
+        Parse queued notification payloads with process_data_bulk until the task is cancelled.
+        """
+        while True:
+            data = await self._rx_q.get()
+            try:
+                process_data_bulk(data, self.ui)
+            except Exception:
+                # Lose this payload only, the task has to keep draining the queue for the rest of the stream
+                log.exception("Failed to process BLE notification.")
 
     async def cleanup(self):
         """
         Clean up the connection and stop notifications.
+
+        Stopping notifications and disconnecting are issued together. Calling this again, also while a previous call
+        is still running, does nothing until the next connection is made.
+
+        Raises:
+        - The exception raised by the disconnect, if it failed.
         """
-        if self.client and self.client.is_connected:
-            await self.client.stop_notify(self.uuid)
-            await self.client.disconnect()
-        print("Disconnected and notification stopped.")
+        if self._cleaned:
+            return
+        self._cleaned = True
+        try:
+            if self.client and self._is_connected:
+                results = await asyncio.gather(self.client.stop_notify(self.uuid), self.client.disconnect(),
+                                               return_exceptions=True)
+                if isinstance(results[1], Exception):
+                    raise results[1]
+                self._is_connected = False
+        finally:
+            if self._stop_event:
+                self._stop_event.set()
+        log.info("Disconnected and notification stopped.")
 
     def start_scan(self):
         """
-        Start a scan for Bluetooth devices in a background thread.
+        Start a scan for Bluetooth devices on the background event loop. Returns without waiting for the scan.
         """
-        if not self.loop.is_running():
-            asyncio.set_event_loop(self.loop)
-            self.loop.run_until_complete(self.scan_for_devices())
-        else:
-            asyncio.run_coroutine_threadsafe(self.scan_for_devices(), self.loop)
+        asyncio.run_coroutine_threadsafe(self.scan_for_devices(), self.loop)
 
     async def scan_for_devices(self):
         """
         Asynchronously scan for Bluetooth devices and update the scan results in the UI.
         """
         try:
-            devices = await BleakScanner.discover()
-            if devices:
-                for device in devices:
-                    if device.name:
-                        device_info = f"Device found: {device.name}, Address: {device.address}"
-                        print(device_info)
-                        self.dialog.update_status_signal.emit(device_info)
+            if self.device_name:
+                # Only one device is of interest, so stop scanning as soon as it shows up
+                device = await self.find_device_by_name()
+                devices = [device] if device else []
             else:
-                print("No devices found.")
-                self.dialog.update_status_signal.emit("No devices found.")
+                self._adv_cache.clear()
+                self._seen_adv.clear()
+                scanner = self._get_scanner()
+                await scanner.start()
+                await asyncio.sleep(SCAN_WINDOW)
+                await scanner.stop()
+                devices = [device for device, _ in self._adv_cache.values()]
+            # Report all devices in one message instead of one signal (and one message box) per device
+            lines = [f"Device found: {device.name}, Address: {device.address}" for device in devices if device.name]
+            device_info = "\n".join(lines) or "No devices found."
+            log.debug(device_info)
+            self.dialog.update_status_signal.emit(device_info)
         except Exception as e:
-            print(f"Error scanning devices: {e}")
+            log.warning("Error scanning devices: %s", e)
 
     def start(self):
         """
         Start the BluetoothManager and connect to a device and start receiving notifications.
+
+        The connection runs on the shared background event loop, so this returns immediately.
         """
-        asyncio.set_event_loop(self.loop)
-        self.loop.run_until_complete(self.connect_and_start_notifications())
-        self.loop.close()
+        asyncio.run_coroutine_threadsafe(self.connect_and_start_notifications(), self.loop)
 
     async def shut(self):
         """
-        Asynchronously shut down the event loop safely.
+        Asynchronously shut down the connection safely.
 
         Returns:
         - True if the connection was closed successfully, False otherwise.
         """
         try:
-            if self.client.is_connected:
-                await self.client.disconnect()
-                print("Disconnected successfully.")
+            if self._is_connected:
+                await self.cleanup()
+                log.info("Disconnected successfully.")
                 return True
         except Exception as e:
-            print(f"Failed to disconnect: {e}")
+            log.warning("Failed to disconnect: %s", e)
             return False
+        finally:
+            # Release wait_for_notifications once the disconnect has finished
+            if self._stop_event:
+                self._stop_event.set()
 
     def stop(self):
         """
         Stop the manager and disconnect.
+
+        The disconnect runs on the background event loop and its outcome is reported through the UI signals by
+        _on_shut_done, so this returns immediately instead of blocking the calling thread.
         """
         future = asyncio.run_coroutine_threadsafe(self.shut(), self.loop)
+        future.add_done_callback(self._on_shut_done)
+        self.loop.call_soon_threadsafe(self.loop.call_later, STOP_TIMEOUT, self._on_shut_timeout, future)
+
+    def _on_shut_timeout(self, future):
+        """
+        Report a timeout and cancel the disconnect if it has not finished within STOP_TIMEOUT seconds.
+
+        Parameters:
+        - future: The future of the shut coroutine.
+        """
+        if not future.done():
+            self.ui.ble_end_status_signal.emit("Timeout occurred while trying to disconnect.")
+            future.cancel()
+
+    def _on_shut_done(self, future):
+        """
+        Emit the result of the disconnect once the shut coroutine has finished.
+
+        Parameters:
+        - future: The future of the shut coroutine.
+        """
+        if future.cancelled():
+            return  # Already reported by _on_shut_timeout
         try:
-            # Wait for the Future to complete and get the result
-            result = future.result(timeout=10)  # You can set a timeout
+            result = future.result()
             if result:
                 message = f"Connection was closed successfully."
                 self.ui.ble_end_status_signal.emit(message)
                 self.ui.ble_status_signal.emit(f"BLE disconnected", "red")
             else:
                 self.ui.ble_end_status_signal.emit("Connection closing failed.")
-        except asyncio.TimeoutError:
-            self.ui.ble_end_status_signal.emit("Timeout occurred while trying to disconnect.")
         except Exception as e:
             self.ui.ble_end_status_signal.emit(f"An error occurred: {e}")
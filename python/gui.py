@@ -2,20 +2,161 @@
 # -*- coding: utf-8 -*-
 import csv
 import os
+import queue
 import threading
 import time
-from datetime import datetime
 
+import numpy as np
 import serial.tools.list_ports
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import pyqtSignal, QObject, QTimer
 from PyQt5.QtWidgets import QMessageBox, QComboBox
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+import pyqtgraph as pg
 
 from bluetooth import BluetoothManager
+from process_data import adc_scale
 from serial_connect import SerialManager
 
+# Qt draws the plot lines directly; antialiasing is not worth its cost for streaming waveforms
+pg.setConfigOptions(antialias=False, background='w', foreground='k')
+
+SAMPLE_RATE = 125  # Nominal sample rate of the sensor in Hz
+PLOT_WINDOW = 6  # Seconds shown in the ECG and IR plots
+PLOT_BUFFER_SIZE = SAMPLE_RATE * PLOT_WINDOW * 2  # Samples kept for plotting, with margin for faster sensor settings
+REDRAW_INTERVAL_MS = 33  # Plot refresh interval, about 30 frames per second
+YRANGE_MARGIN = 0.05  # Headroom added when a plot's y range grows, so small excursions do not change it again
+DROP_STATUS_INTERVAL_MS = 1000  # Refresh interval of the dropped sample counter in the status bar
+RECORD_QUEUE_SIZE = 10000  # Maximum number of rows waiting to be written to the CSV file
+RECORD_FILE_BUFFER = 1 << 16  # Write buffer of the CSV file in bytes
+RECORD_START = object()  # Marks the (RECORD_START, file_path, write_header) message that opens a recording
+
+# Stylesheet of the SpO2 display, applied once in setupUi
+SPO2_QSS = ("QTextBrowser {\n"
+            "  background-color: rgb(143, 0, 2);\n"
+            "  color:#ffe6e9; /* 文字颜色为白色 */\n"
+            "  font-size: 18pt;\n"
+            "  font-weight: bold; /* 字体加粗 */\n"
+            "  font-family: \'Arial\'; \n"
+            "  text-align: center; \n"
+            "  border-radius: 15px;\n"
+            "}")
+
+# Stylesheets of the recording started/stopped message boxes
+RECORDING_START_QSS = """
+        QMessageBox {
+            background-color: #f2f2f2;
+            color: #333;
+            font-family: Arial;
+            font-size: 14px;
+            width: 2000px; /* Widen the message box */
+        }
+        QPushButton {
+            background-color: #4CAF50;
+            color: white;
+            border-radius: 5px;
+            padding: 15px 20px; /* Bigger buttons */
+            font-size: 16px; /* Larger font size for the buttons */
+            margin: 10px 5px;
+        }
+        QPushButton:hover {
+            background-color: #45a049;
+        }
+    """
+RECORDING_STOP_QSS = """
+        QMessageBox {
+            background-color: #f2f2f2;
+            color: #333;
+            font-family: 'Arial';
+            font-size: 14px;
+        }
+        QPushButton {
+            background-color: #4CAF50;
+            color: white;
+            border-radius: 5px;
+            padding: 10px;
+            font-size: 16px;
+            margin: 4px 2px;
+        }
+        QPushButton:hover {
+            background-color: #45a049;
+        }
+    """
+
+# Button stylesheets covering both states, selected through the "state" dynamic property so they are parsed once
+START_BUTTON_QSS = ("QPushButton {\n"
+                    "    border-radius: 10px;\n"  # 保持圆角样式
+                    "}\n"
+                    "QPushButton[state=\"off\"] {\n"
+                    "    background-color: green;\n"  # 设置背景为绿色
+                    "    color: black;\n"  # 设置文字颜色为黑色
+                    "}\n"
+                    "QPushButton[state=\"off\"]:hover {\n"
+                    "    background-color: #02ad66;\n"
+                    "    color: black;\n"
+                    "}\n"
+                    "QPushButton[state=\"on\"] {\n"
+                    "    background-color: #8c1b07;\n"  # 设置背景为红色
+                    "    color: white;\n"  # 设置文字颜色为白色
+                    "}\n"
+                    "QPushButton[state=\"on\"]:hover {\n"
+                    "    background-color: #af4747;\n"
+                    "    color: black;\n"
+                    "}")
+RECORD_BUTTON_QSS = ("QPushButton {\n"
+                     "    border-radius: 10px;\n"  # 保持圆角样式
+                     "}\n"
+                     "QPushButton[state=\"off\"] {\n"
+                     "    background-color: rgb(0, 0, 127);\n"
+                     "    color: white;\n"
+                     "}\n"
+                     "QPushButton[state=\"off\"]:hover {\n"
+                     "    background-color: #0253a3;\n"
+                     "    color: white;\n"
+                     "}\n"
+                     "QPushButton[state=\"on\"] {\n"
+                     "    background-color: #8c1b07;\n"  # 设置背景为红色
+                     "    color: white;\n"  # 设置文字颜色为白色
+                     "}\n"
+                     "QPushButton[state=\"on\"]:hover {\n"
+                     "    background-color: #af4747;\n"
+                     "    color: black;\n"
+                     "}")
+BLE_BUTTON_QSS = ("QPushButton {\n"
+                  "    color: white; \n"  # 字体颜色
+                  "    font-weight: bold; \n"  # 字体加粗
+                  "    border-radius: 10px; \n"  # 边框圆角
+                  "}\n"
+                  "QPushButton:hover {\n"
+                  "    border: 2px solid #ffffff; \n"  # 添加白色边框
+                  "    box-shadow: 0 0 8px 0 rgba(255, 255, 255, 0.5); \n"  # 添加白色半透明阴影
+                  "}\n"
+                  "QPushButton[state=\"off\"] {\n"
+                  "    background-color: #0307ff; \n"  # 未连接时的背景颜色
+                  "}\n"
+                  "QPushButton[state=\"off\"]:hover {\n"
+                  "    background-color: #3fa9f5; \n"  # 悬停时变为亮蓝色
+                  "}\n"
+                  "QPushButton[state=\"on\"] {\n"
+                  "    background-color: #7d0000; \n"  # 已连接时的背景颜色
+                  "}\n"
+                  "QPushButton[state=\"on\"]:hover {\n"
+                  "    background-color: #c43e3e; \n"  # 悬停时变为亮红色
+                  "}")
+STATUS_LABEL_QSS_TEMPLATE = """
+                    QLabel {{
+                        background-color: #f7f7f7;
+                        color: {color};
+                        font-family: 'Arial';
+                        font-size: 14px;
+                        border: 1px solid #ccc;
+                        border-radius: 8px;
+                        padding: 4px;
+                        text-align: center;
+                    }}
+                """
+# Status label stylesheets keyed by text color, for the colors the managers report
+STATUS_LABEL_QSS = {color: STATUS_LABEL_QSS_TEMPLATE.format(color=color) for color in ("#333", "red", "green")}
+
 
 # Function to get the list of available serial ports
 def get_serial_ports():
@@ -33,6 +174,8 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
     spo2_update_signal = pyqtSignal(str)
     ble_status_signal = QtCore.pyqtSignal(str, str)
     heart_rate_signal = QtCore.pyqtSignal(str)  # Signal to update heart rate in the GUI
+    data_batch_signal = pyqtSignal(object, object)  # Arrays of ECG (mV) and IR samples to plot
+    record_error_signal = pyqtSignal(str)  # Emitted by the record writer when the CSV file cannot be written
 
     def __init__(self, parent=None):
         """
@@ -40,7 +183,6 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         """
         super(Ui_MainWindow, self).__init__(parent)
         # Initialize variables
-        self.ble_thread = None
         self.ble_manager = None
         self.dialog = None
         self.using_ble = False
@@ -51,23 +193,55 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         self.recording = False  # Recording status
         self.spo2_update_signal.connect(self.update_spo2_display)
         self.heart_rate_signal.connect(self.update_heart_rate_display)
+        self.data_batch_signal.connect(self.add_batch)
         self.spo2_timer = QTimer(self)  # Ensure self is passed to manage the timer's lifecycle
         self.spo2_timer.timeout.connect(self.on_spo2_timer_timeout)
         self.last_valid_spo2 = "N/A"
+        # Text and style currently shown in the heart rate and SpO2 displays
+        self.heart_rate_text = None
+        self.spo2_text = None
         self.file_path = "ecg_ppg_log.csv"
         self.port = "COM11"
         self.plot_timer = QTimer(self)
-        self.plot_timer.timeout.connect(self.reset_plot)
-        self.plot_timer.start(6000)  # Reset the plot every 6 seconds
-        self.ecg_data = []
-        self.ir_data = []
-        self.ecg_time_stamps = []
-        self.ir_time_stamps = []
+        self.plot_timer.timeout.connect(self.reset_plot)  # Resets the plot every 6 seconds while receiving
+        # Redraw at display rate instead of once per received sample
+        self.plot_dirty = False
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.timeout.connect(self.redraw_if_dirty)
+        # Preallocated ring buffers holding the samples of the current plot window
+        self.ecg_buf = np.empty(PLOT_BUFFER_SIZE, dtype=np.float32)
+        self.ir_buf = np.empty(PLOT_BUFFER_SIZE, dtype=np.float32)
+        self.time_stamps = np.empty(PLOT_BUFFER_SIZE, dtype=np.float32)  # Shared timebase of both plots
+        self.plot_head = 0  # Index the next sample is written to
+        self.plot_count = 0  # Number of valid samples in the buffers
+        # Samples overwritten before they were drawn, and recorded rows dropped because the writer fell behind
+        self.dropped_samples = 0
+        self.dropped_rows = 0
+        self.drop_status_timer = QTimer(self)
+        self.drop_status_timer.timeout.connect(self.update_drop_status)
+        self.ecg_ylim = None  # y range currently shown in the ECG plot
+        self.ir_ylim = None  # y range currently shown in the IR plot
+        self.reset_extrema()
         self.start_time = time.time()
         self.count = 0
         self.is_receiving_data = False
         self.is_recording_data = False
         self.resolution_bits = 18
+        self.adc_scale = adc_scale(self.resolution_bits)  # Millivolts per ADC step, read for every packet
+        # Recorded rows are written to the CSV file by a background thread
+        self.record_error_signal.connect(self.on_record_error)
+        self.record_queue = queue.Queue(maxsize=RECORD_QUEUE_SIZE)
+        self.record_thread = threading.Thread(target=self.record_worker, name="RecordWriterThread", daemon=True)
+        self.record_thread.start()
+        # The recording message boxes are built and styled once and only shown again on later toggles
+        self.rec_start_box = QMessageBox(self)
+        self.rec_start_box.setWindowTitle("Recording")
+        self.rec_start_box.setStyleSheet(RECORDING_START_QSS)
+        self.rec_stop_box = QMessageBox(self)
+        self.rec_stop_box.setWindowTitle("Recording")
+        self.rec_stop_box.setText("Recording stopped.")
+        self.rec_stop_box.setIcon(QMessageBox.Information)
+        self.rec_stop_box.setStyleSheet(RECORDING_STOP_QSS)
         self.setupUi(self)  # Pass self as MainWindow
 
         # Initialize the serial manager
@@ -95,18 +269,16 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
                                         "    border: 2px solid black;"  # Add black border
                                         "    border-radius: 10px;"  # Border radius
                                         "}")
-        self.ir_figure = Figure()
-        self.ir_canvas = FigureCanvas(self.ir_figure)
-        self.ir_canvas.setParent(self.ir_data_plot)
+        self.ir_plot = pg.PlotWidget(self.ir_data_plot)
 
-        # Fill the ir_data widget with the canvas
+        # Fill the ir_data widget with the plot
         ir_layout = QtWidgets.QVBoxLayout(self.ir_data_plot)
-        ir_layout.addWidget(self.ir_canvas)
+        ir_layout.addWidget(self.ir_plot)
 
-        self.ir_ax = self.ir_figure.add_subplot(111)
-        self.ir_ax.set_xlim(0, 6)  # Fixed 6-second window
-        self.ir_ax.grid(True)
-        self.ir_line, = self.ir_ax.plot([], [], 'b-')
+        self.ir_plot.disableAutoRange()  # Ranges are set explicitly, no per-frame data scan
+        self.ir_plot.setXRange(0, 6, padding=0)  # Fixed 6-second window
+        self.ir_plot.showGrid(x=True, y=True)
+        self.ir_curve = self.ir_plot.plot([], [], pen='b')
 
         # Set up the ECG data plot
         self.ecg_data_plot = QtWidgets.QWidget(self.centralwidget)
@@ -117,21 +289,19 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
                                          "    border-radius: 10px;"  # Border radius
                                          "}")
 
-        # Setup the matplotlib Figure and FigureCanvas
-        self.ecg_figure = Figure()
-        self.ecg_canvas = FigureCanvas(self.ecg_figure)
-        self.ecg_canvas.setParent(self.ecg_data_plot)
+        # Setup the pyqtgraph PlotWidget
+        self.ecg_plot = pg.PlotWidget(self.ecg_data_plot)
 
-        # Fill the ecg_data widget with the canvas
+        # Fill the ecg_data widget with the plot
         ecg_layout = QtWidgets.QVBoxLayout(self.ecg_data_plot)
-        ecg_layout.addWidget(self.ecg_canvas)
+        ecg_layout.addWidget(self.ecg_plot)
 
-        self.ecg_ax = self.ecg_figure.add_subplot(111)
-        self.ecg_ax.set_xlim(0, 6)  # Fixed 6-second window
-        self.ecg_ax.grid(True)
-        self.ecg_ax.set_xlabel('Time (s)')  # Set x-axis label
-        self.ecg_ax.set_ylabel('Voltage (mV)')
-        self.ecg_line, = self.ecg_ax.plot([], [], 'r-')
+        self.ecg_plot.disableAutoRange()  # Ranges are set explicitly, no per-frame data scan
+        self.ecg_plot.setXRange(0, 6, padding=0)  # Fixed 6-second window
+        self.ecg_plot.showGrid(x=True, y=True)
+        self.ecg_plot.setLabel('bottom', 'Time (s)')  # Set x-axis label
+        self.ecg_plot.setLabel('left', 'Voltage (mV)')
+        self.ecg_curve = self.ecg_plot.plot([], [], pen='r')
 
         # Set up the IR data label
         self.ir_label = QtWidgets.QLabel("IR Data", self.centralwidget)
@@ -172,57 +342,24 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         # Set up the SpO2 QTextBrowser
         self.spO2 = QtWidgets.QTextBrowser(self.centralwidget)
         self.spO2.setGeometry(QtCore.QRect(480, 170, 271, 81))
-        self.spO2.setStyleSheet("QTextBrowser {\n"
-                                "  background-color: rgb(143, 0, 2);\n"
-                                "  color:#ffe6e9; /* Text color is white */\n"
-                                "  font-weight: bold; /* Font is bold */\n"
-                                "  font-family: \'Arial\'; \n"
-                                "  text-align: center; \n"
-                                "  border-radius: 15px;\n"
-                                "}")
+        self.spO2.setStyleSheet(SPO2_QSS)
         self.spO2.setObjectName("spO2")
 
         # Set up the start QPushButton
         self.start_pb = QtWidgets.QPushButton(self.centralwidget)
         self.start_pb.setGeometry(QtCore.QRect(470, 20, 91, 31))
-        self.start_pb.setStyleSheet("QPushButton {\n"
-                                    "    background-color: green;\n"
-                                    "    color: black;\n"
-                                    "border-radius: 10px;          \n"
-                                    "}\n"
-                                    "QPushButton:hover {\n"
-                                    "    background-color: #02ad66;  \n"
-                                    "    color: black;              \n"
-                                    "}")
+        self.start_pb.setProperty("state", "off")
+        self.start_pb.setStyleSheet(START_BUTTON_QSS)
         self.start_pb.setObjectName("start_pb")
         self.start_pb.clicked.connect(self.toggle_data_receiving)
 
         self.record_pb = QtWidgets.QPushButton(self.centralwidget)
         self.record_pb.setGeometry(QtCore.QRect(570, 20, 91, 31))
-        self.record_pb.setStyleSheet("QPushButton {\n"
-                                     "    background-color: rgb(0, 0, 127);\n"
-                                     "    color: white;      \n"
-                                     "border-radius: 10px;    \n"
-                                     "}\n"
-                                     "QPushButton:hover {\n"
-                                     "    background-color: #0253a3;  \n"
-                                     "    color: white;              \n"
-                                     "}")
+        self.record_pb.setProperty("state", "off")
+        self.record_pb.setStyleSheet(RECORD_BUTTON_QSS)
         self.record_pb.setObjectName("record_pb")
         self.record_pb.clicked.connect(self.toggle_recording)
 
-        label_style = """
-                        QLabel {
-                            background-color: #f7f7f7;
-                            color: #333;
-                            font-family: 'Arial';
-                            font-size: 14px;
-                            border: 1px solid #ccc;
-                            border-radius: 8px;
-                            padding: 4px;
-                            text-align: center;
-                        }
-                        """
         self.radio_bluetooth = QtWidgets.QRadioButton("Use Bluetooth Data", self.centralwidget)
         self.radio_serial = QtWidgets.QRadioButton("Use Serial Data", self.centralwidget)
 
@@ -241,29 +378,20 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         self.ble_connection = QtWidgets.QLabel(self.centralwidget)
         self.ble_connection.setGeometry(QtCore.QRect(510, 520, 271, 30))
         self.ble_connection.setObjectName("ble_connection")
-        self.ble_connection.setStyleSheet(label_style)
+        self.ble_connection.setStyleSheet(STATUS_LABEL_QSS["#333"])
         self.ble_status_signal.connect(self.update_ble_status)
         # 设置 serial_connection QLabel
         self.serial_connection = QtWidgets.QLabel(self.centralwidget)
         self.serial_connection.setGeometry(QtCore.QRect(510, 560, 271, 30))
         self.serial_connection.setObjectName("serial_connection")
-        self.serial_connection.setStyleSheet(label_style)
+        self.serial_connection.setStyleSheet(STATUS_LABEL_QSS["#333"])
         # 连接信号到一个槽，用于更新串口状态
         self.serial_status_signal.connect(self.update_serial_status)
 
         self.connect_BLE = QtWidgets.QPushButton(self.centralwidget)
         self.connect_BLE.setGeometry(QtCore.QRect(480, 350, 200, 40))  # 调整位置和大小
-        self.connect_BLE.setStyleSheet("QPushButton {\n"
-                                       "    background-color: #0307ff; \n"  # 默认背景颜色
-                                       "    color: white; \n"  # 字体颜色
-                                       "    font-weight: bold; \n"  # 字体加粗
-                                       "    border-radius: 10px; \n"  # 边框圆角
-                                       "}\n"
-                                       "QPushButton:hover {\n"
-                                       "    background-color: #3fa9f5; \n"  # 悬停时变为亮蓝色
-                                       "    border: 2px solid #ffffff; \n"  # 添加白色边框
-                                       "    box-shadow: 0 0 8px 0 rgba(255, 255, 255, 0.5); \n"  # 添加白色半透明阴影
-                                       "}")
+        self.connect_BLE.setProperty("state", "off")
+        self.connect_BLE.setStyleSheet(BLE_BUTTON_QSS)
         self.connect_BLE.setObjectName("connect_BLE")
         self.connect_BLE.clicked.connect(lambda: self.open_ble_dialog(MainWindow))
 
@@ -297,9 +425,9 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
 
         # 显示当前选中的端口
         self.statusBar().showMessage(f"Selected Port: {self.comboBox.currentText()}")
+        self.drop_status = QtWidgets.QLabel(self.centralwidget)
+        self.statusBar().addPermanentWidget(self.drop_status)
         self.comboBox.currentIndexChanged.connect(self.port_update_status)
-        self.serial_manager = SerialManager(self.port, 57600, self)
-        self.serial_manager.start()
 
         # Styling for the radio buttons
         radio_button_style = """
@@ -351,6 +479,12 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
 
+    def closeEvent(self, event):
+        # Stop the serial reader thread and release the port before the window goes away
+        if self.serial_manager:
+            self.serial_manager.stop()
+        super(Ui_MainWindow, self).closeEvent(event)
+
     def show_end_ble_message(self, message):
         QtWidgets.QMessageBox.information(self, "Connection Status", message)
     def open_ble_dialog(self,MainWindow):
@@ -365,32 +499,10 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         if self.is_ble_connected:
             # 蓝牙已连接时的按钮样式
             self.connect_BLE.setText("Disconnect BLE")
-            self.connect_BLE.setStyleSheet("QPushButton {\n"
-                                           "    background-color: #7d0000; \n"  # 默认背景颜色
-                                           "    color: white; \n"  # 字体颜色
-                                           "    font-weight: bold; \n"  # 字体加粗
-                                           "    border-radius: 10px; \n"  # 边框圆角
-                                           "}\n"
-                                           "QPushButton:hover {\n"
-                                           "    background-color: #c43e3e; \n"  # 悬停时变为亮蓝色
-                                           "    border: 2px solid #ffffff; \n"  # 添加白色边框
-                                           "    box-shadow: 0 0 8px 0 rgba(255, 255, 255, 0.5); \n"  # 添加白色半透明阴影
-                                           "}")
         else:
             # 蓝牙未连接时的按钮样式
             self.connect_BLE.setText("Connect to BLE")
-            self.connect_BLE.setStyleSheet("QPushButton {\n"
-                                           "    background-color: #0307ff; \n"  # 默认背景颜色
-                                           "    color: white; \n"  # 字体颜色
-                                           "    font-weight: bold; \n"  # 字体加粗
-                                           "    border-radius: 10px; \n"  # 边框圆角
-                                           "}\n"
-                                           "QPushButton:hover {\n"
-                                           "    background-color: #3fa9f5; \n"  # 悬停时变为亮蓝色
-                                           "    border: 2px solid #ffffff; \n"  # 添加白色边框
-                                           "    box-shadow: 0 0 8px 0 rgba(255, 255, 255, 0.5); \n"  # 添加白色半透明阴影
-                                           "}")
-
+        self.set_button_state(self.connect_BLE, self.is_ble_connected)
 
     def port_update_status(self):
         selected_port = self.comboBox.currentText()
@@ -428,21 +540,9 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
             self.show_data_source_options()
         else:
             self.hide_data_source_options()
-        self.serial_connection.setText(text)
         # 更新 QLabel 文本和颜色，并确保样式一致
         self.serial_connection.setText(text)
-        self.serial_connection.setStyleSheet(f"""
-                    QLabel {{
-                        background-color: #f7f7f7;
-                        color: {color};
-                        font-family: 'Arial';
-                        font-size: 14px;
-                        border: 1px solid #ccc;
-                        border-radius: 8px;
-                        padding: 4px;
-                        text-align: center;
-                    }}
-                """)
+        self.set_status_style(self.serial_connection, color)
 
     def update_ble_status(self, text, color):
         if color == "red":
@@ -456,157 +556,188 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
 
         self.update_ble_button()
 
-        # 更新 QLabel 文本和颜色
-        self.ble_connection.setText(text)
         # 更新 QLabel 文本和颜色，并确保样式一致
         self.ble_connection.setText(text)
-        self.ble_connection.setStyleSheet(f"""
-                    QLabel {{
-                        background-color: #f7f7f7;
-                        color: {color};
-                        font-family: 'Arial';
-                        font-size: 14px;
-                        border: 1px solid #ccc;
-                        border-radius: 8px;
-                        padding: 4px;
-                        text-align: center;
-                    }}
-                """)
+        self.set_status_style(self.ble_connection, color)
+
+    def set_status_style(self, label, color):
+        """
+        Apply the status label stylesheet for the given color, skipping Qt's stylesheet parse when it is unchanged.
+
+        Parameters:
+        - label: The status QLabel to restyle.
+        - color: Text color reported with the status.
+        """
+        qss = STATUS_LABEL_QSS.get(color)
+        if qss is None:
+            qss = STATUS_LABEL_QSS[color] = STATUS_LABEL_QSS_TEMPLATE.format(color=color)
+        if label.styleSheet() != qss:
+            label.setStyleSheet(qss)
 
     def toggle_data_receiving(self):
         self.is_receiving_data = not self.is_receiving_data  # 切换状态
+        if self.ble_manager:
+            self.ble_manager.rebind_handler(self.is_receiving_data)
         if self.is_receiving_data:
             self.start_pb.setText("Stop")
-            self.start_pb.setStyleSheet("QPushButton {"
-                                        "    background-color: #8c1b07;"  # 设置背景为红色
-                                        "    color: white;"  # 设置文字颜色为白色
-                                        "    border-radius: 10px;"  # 保持圆角样式
-                                        "}"
-                                        "QPushButton:hover {\n"
-                                        "    background-color: #af4747;  \n"
-                                        "    color: black;              \n"
-                                        "}"
-                                        )
+            self.set_button_state(self.start_pb, True)
+            # 只在接收数据时运行绘图定时器
+            self.plot_timer.start(6000)
+            self.redraw_timer.start(REDRAW_INTERVAL_MS)
+            self.drop_status_timer.start(DROP_STATUS_INTERVAL_MS)
         else:
             self.start_pb.setText("Start")
-            self.start_pb.setStyleSheet("QPushButton {"
-                                        "    background-color: green;"  # 设置背景为绿色
-                                        "    color: black;"  # 设置文字颜色为黑色
-                                        "    border-radius: 10px;"  # 保持圆角样式
-                                        "}"
-                                        "QPushButton:hover {\n"
-                                        "    background-color: #02ad66;  \n"
-                                        "    color: black;              \n"
-                                        "}"
-                                        )
+            self.set_button_state(self.start_pb, False)
+            self.plot_timer.stop()
+            self.redraw_timer.stop()
+            self.drop_status_timer.stop()
+            self.update_drop_status()
 
     def toggle_recording(self):
         if not self.is_recording_data:
             self.record_pb.setText("Stop")
-            self.record_pb.setStyleSheet("QPushButton {"
-                                         "    background-color: #8c1b07;"  # 设置背景为红色
-                                         "    color: white;"  # 设置文字颜色为白色
-                                         "    border-radius: 10px;"  # 保持圆角样式
-                                         "}"
-                                         "QPushButton:hover {\n"
-                                         "    background-color: #af4747;  \n"
-                                         "    color: black;              \n"
-                                         "}"
-                                         )
+            self.set_button_state(self.record_pb, True)
             self.start_recording()
         else:
             self.record_pb.setText("Record")
-            self.record_pb.setStyleSheet("QPushButton {\n"
-                                         "    background-color: rgb(0, 0, 127);\n"
-                                         "    color: white;      \n"
-                                         "border-radius: 10px;    \n"
-                                         "}\n"
-                                         "QPushButton:hover {\n"
-                                         "    background-color: #0253a3;  \n"
-                                         "    color: white;              \n"
-                                         "}")
+            self.set_button_state(self.record_pb, False)
             self.stop_recording()
 
+    def set_button_state(self, button, on):
+        """
+        Switch a button between the "on" and "off" rules of its stylesheet by updating its state property.
+
+        Only the button itself is repolished, its stylesheet is not parsed again.
+
+        Parameters:
+        - button: The QPushButton to update.
+        - on: True to select the "on" rules, False for the "off" rules.
+        """
+        state = "on" if on else "off"
+        if button.property("state") == state:
+            return
+        button.setProperty("state", state)
+        button.style().unpolish(button)
+        button.style().polish(button)
+
     def start_recording(self):
         self.file_path = 'ecg_ppg_log.csv'
-        msg_box = QMessageBox()
-        msg_box.setWindowTitle("Recording")
-        msg_box.setText(f"<h2>Recording Started</h2><p>Recording data will be saved to:<br><b>{self.file_path}</b></p>")
-        msg_box.setStyleSheet("""
-                QMessageBox {
-                    background-color: #f2f2f2;
-                    color: #333;
-                    font-family: Arial;
-                    font-size: 14px;
-                    width: 2000px; /* Widen the message box */
-                }
-                QPushButton {
-                    background-color: #4CAF50;
-                    color: white;
-                    border-radius: 5px;
-                    padding: 15px 20px; /* Bigger buttons */
-                    font-size: 16px; /* Larger font size for the buttons */
-                    margin: 10px 5px;
-                }
-                QPushButton:hover {
-                    background-color: #45a049;
-                }
-            """)
-        msg_box.exec_()
+        # 每次录制只检查一次文件，决定是否需要写入标题
+        write_header = not (os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0)
+        self.rec_start_box.setText(f"<h2>Recording Started</h2><p>Recording data will be saved to:<br><b>{self.file_path}</b></p>")
+        self.rec_start_box.exec_()
+        # The writer only learns the file through the queue, so it never reads state the GUI thread changes
+        self.send_record_message((RECORD_START, self.file_path, write_header))
         self.is_recording_data = True
 
     def stop_recording(self):
-        msg_box = QMessageBox()
-        msg_box.setWindowTitle("Recording")
-        msg_box.setText("Recording stopped.")
-        msg_box.setIcon(QMessageBox.Information)
-        msg_box.setStyleSheet("""
-                QMessageBox {
-                    background-color: #f2f2f2;
-                    color: #333;
-                    font-family: 'Arial';
-                    font-size: 14px;
-                }
-                QPushButton {
-                    background-color: #4CAF50;
-                    color: white;
-                    border-radius: 5px;
-                    padding: 10px;
-                    font-size: 16px;
-                    margin: 4px 2px;
-                }
-                QPushButton:hover {
-                    background-color: #45a049;
-                }
-            """)
-        msg_box.exec_()
+        self.rec_stop_box.exec_()
         self.is_recording_data = False
+        self.send_record_message(None)  # Let the writer close the file
+
+    def send_record_message(self, message):
+        """
+        Queue a start or stop message for the record writer without blocking the GUI thread.
+
+        A full queue means the writer has fallen far behind. The pending rows are then dropped and counted in
+        dropped_rows, so that the message still gets through. A start message also closes any file left open.
+
+        Parameters:
+        - message: A (RECORD_START, file_path, write_header) tuple, or None to close the file.
+        """
+        while True:
+            try:
+                self.record_queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    while True:
+                        row = self.record_queue.get_nowait()
+                        if row is not None and row[0] is not RECORD_START:
+                            self.dropped_rows += 1
+                except queue.Empty:
+                    pass
+
+    def on_record_error(self, message):
+        """Stop the recording after the record writer failed to write the CSV file, and tell the user why"""
+        if self.is_recording_data:
+            self.is_recording_data = False
+            self.record_pb.setText("Record")
+            self.set_button_state(self.record_pb, False)
+        QMessageBox.warning(self, "Recording", f"Recording failed: {message}")
 
     def record_data(self, ecg, ir, red, spo2):
-        # 检查文件是否存在，如果不存在则添加标题
+        # 只把数据放入队列，文件写入由后台线程完成
+        try:
+            self.record_queue.put_nowait((time.time(), ecg, ir, red, spo2))
+        except queue.Full:
+            self.dropped_rows += 1  # The writer has fallen behind, drop the row rather than block the caller
+
+    def record_worker(self):
+        """
+        Write queued rows to the CSV file, keeping it open while recording and writing in batches.
+
+        A recording is opened by a (RECORD_START, file_path, write_header) message and closed by None. An OSError
+        is reported through record_error_signal, and rows are then discarded until the next recording starts.
+        """
         headers = ["Timestamp", "ECG", "IR", "RED", "SpO2"]
-        file_exists = os.path.exists(self.file_path)  # 使用self.file_path
-
-        with open(self.file_path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            # 如果文件不存在，则写入列标题
-            if not file_exists:
-                writer.writerow(headers)
-
-            # 写入实际的数据
-            formatted_spo2 = spo2 if spo2 is not None else 'N/A'  # 处理None情况，显示为'N/A'
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ecg,
-                ir,
-                red,
-                formatted_spo2
-            ])
+        file = None
+        writer = None
+        ts_sec = None  # Second the cached timestamp string belongs to
+        ts_str = ""
+        while True:
+            rows = [self.record_queue.get()]
+            while True:
+                try:
+                    rows.append(self.record_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            try:
+                for row in rows:
+                    if row is None or row[0] is RECORD_START:
+                        # Recording stopped or a new one starts, close the current file first
+                        if file:
+                            writer.writerows(lines)
+                            lines = []
+                            file.close()
+                            file = None
+                        if row is not None:
+                            _, file_path, write_header = row
+                            file = open(file_path, mode='a', buffering=RECORD_FILE_BUFFER, newline='')
+                            writer = csv.writer(file)
+                            # 如果文件是新的，则写入列标题
+                            if write_header:
+                                writer.writerow(headers)
+                        continue
+                    if file is None:
+                        continue  # No recording open, e.g. after a file error
+                    timestamp, ecg, ir, red, spo2 = row
+                    # Many rows share one second, only format the timestamp when the second changes
+                    sec = int(timestamp)
+                    if sec != ts_sec:
+                        ts_sec = sec
+                        ts_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+                    formatted_spo2 = spo2 if spo2 is not None else 'N/A'  # 处理None情况，显示为'N/A'
+                    lines.append((ts_str, ecg, ir, red, formatted_spo2))
+                if file:
+                    writer.writerows(lines)
+                    file.flush()
+            except OSError as e:
+                # Disk full, file locked or removed: give up on this recording but keep the thread alive
+                if file:
+                    try:
+                        file.close()
+                    except OSError:
+                        pass
+                    file = None
+                self.record_error_signal.emit(str(e))
 
     def change_adc_bits(self, adc_bits):
-        global resolution_bits
-        # Update ADC bit setting based on selected radio button
-        resolution_bits = adc_bits
+        # Update ADC bit setting based on selected radio button, process_packet reads it from the UI object
+        self.resolution_bits = adc_bits
+        self.adc_scale = adc_scale(adc_bits)
 
     def add_data(self, ecg_data, ir_data):
         current_time = time.time()
@@ -615,101 +746,161 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
 
         elapsed_time = current_time - self.start_time
         self.count += 1
-        self.ir_data.append(ir_data)
-        self.ecg_data.append(ecg_data)
-        self.ecg_time_stamps.append(elapsed_time)
-        self.ir_time_stamps.append(elapsed_time)
-        if elapsed_time > 6:
+        head = self.plot_head
+        if self.plot_count == PLOT_BUFFER_SIZE:
+            self.dropped_samples += 1  # The oldest sample is overwritten before it was drawn
+        self.ir_buf[head] = ir_data
+        self.ecg_buf[head] = ecg_data
+        self.time_stamps[head] = elapsed_time
+        ecg_value = float(self.ecg_buf[head])
+        ir_value = float(self.ir_buf[head])
+        self.ecg_min = min(self.ecg_min, ecg_value)
+        self.ecg_max = max(self.ecg_max, ecg_value)
+        self.ir_min = min(self.ir_min, ir_value)
+        self.ir_max = max(self.ir_max, ir_value)
+        self.plot_head = (head + 1) % PLOT_BUFFER_SIZE
+        self.plot_count = min(self.plot_count + 1, PLOT_BUFFER_SIZE)
+        self.plot_dirty = True
+
+    def add_batch(self, ecg_batch, ir_batch):
+        """Store a batch of samples that arrived together, spreading their timestamps since the previous sample"""
+        n = len(ecg_batch)
+        current_time = time.time()
+        if self.start_time is None:
+            self.start_time = current_time
+
+        elapsed_time = current_time - self.start_time
+        last_time = self.time_stamps[self.plot_head - 1] if self.plot_count else 0.0
+        time_stamps = np.linspace(last_time, elapsed_time, n + 1)[1:]
+        self.count += n
+        self.dropped_samples += max(0, self.plot_count + n - PLOT_BUFFER_SIZE)
+        index = (self.plot_head + np.arange(n)) % PLOT_BUFFER_SIZE
+        self.ecg_buf[index] = ecg_batch
+        self.ir_buf[index] = ir_batch
+        self.time_stamps[index] = time_stamps
+        if n:
+            self.ecg_min = min(self.ecg_min, float(np.min(self.ecg_buf[index])))
+            self.ecg_max = max(self.ecg_max, float(np.max(self.ecg_buf[index])))
+            self.ir_min = min(self.ir_min, float(np.min(self.ir_buf[index])))
+            self.ir_max = max(self.ir_max, float(np.max(self.ir_buf[index])))
+        self.plot_head = (self.plot_head + n) % PLOT_BUFFER_SIZE
+        self.plot_count = min(self.plot_count + n, PLOT_BUFFER_SIZE)
+        self.plot_dirty = True
+
+    def update_drop_status(self):
+        """Show the number of dropped plot samples and recorded rows in the status bar"""
+        if self.dropped_samples or self.dropped_rows:
+            text = f"dropped: {self.dropped_samples} samples, {self.dropped_rows} rows"
+            if text != self.drop_status.text():
+                self.drop_status.setText(text)
+
+    def reset_extrema(self):
+        """Forget the extrema of the plotted samples, which are tracked as samples arrive instead of per frame"""
+        self.ecg_min = self.ir_min = float("inf")
+        self.ecg_max = self.ir_max = float("-inf")
+
+    def redraw_if_dirty(self):
+        """Redraw the plots if samples arrived since the last frame, starting a new sweep after the plot window"""
+        if not self.plot_dirty:
+            return
+        self.plot_dirty = False
+        if time.time() - self.start_time > PLOT_WINDOW:
             self.reset_plot()
         else:
             self.update_plot()
 
+    def ordered_samples(self, buf):
+        """Return the valid samples of a plot ring buffer, oldest first"""
+        if self.plot_count < PLOT_BUFFER_SIZE:
+            return buf[:self.plot_count]
+        return np.concatenate((buf[self.plot_head:], buf[:self.plot_head]))
+
     def update_plot(self):
-        self.ecg_line.set_data(self.ecg_time_stamps, self.ecg_data)
-        self.ir_line.set_data(self.ir_time_stamps, self.ir_data)
-        if len(self.ecg_data) > 0:
-            min_val = min(self.ecg_data) - 1
-            max_val = max(self.ecg_data) + 1
+        ecg_data = self.ordered_samples(self.ecg_buf)
+        ir_data = self.ordered_samples(self.ir_buf)
+        # The samples are always finite, so pyqtgraph's per-update NaN/inf scan is skipped
+        time_stamps = self.ordered_samples(self.time_stamps)
+        self.ecg_curve.setData(time_stamps, ecg_data, skipFiniteCheck=True)
+        self.ir_curve.setData(time_stamps, ir_data, skipFiniteCheck=True)
+        if len(ecg_data) > 0:
+            min_val = self.ecg_min - 1
+            max_val = self.ecg_max + 1
             if min_val == max_val:
                 # 如果最小值和最大值相同，则人为地扩展范围
                 min_val -= 0.1  # 例如，可以减少最小值的0.1
                 max_val += 0.1  # 增加最大值的0.1
-            self.ecg_ax.set_ylim(min_val, max_val)
         else:
             # 如果没有数据，则设置一个默认范围
-            self.ecg_ax.set_ylim(0, 10)
-        self.ecg_canvas.draw_idle()
-
-        if len(self.ir_data) > 0:
-            min_val = min(self.ir_data) - 10
-            max_val = max(self.ir_data) + 10
+            min_val, max_val = 0, 10
+        # Only touch the axis when the data leaves the range currently shown
+        if self.ecg_ylim is None or min_val < self.ecg_ylim[0] or max_val > self.ecg_ylim[1]:
+            self.ecg_ylim = self.padded_range(min_val, max_val)
+            self.ecg_plot.setYRange(*self.ecg_ylim, padding=0)
+
+        if len(ir_data) > 0:
+            min_val = self.ir_min - 10
+            max_val = self.ir_max + 10
             if min_val == max_val:
                 # 如果最小值和最大值相同，则人为地扩展范围
                 min_val -= 0.1  # 例如，可以减少最小值的0.1
                 max_val += 0.1  # 增加最大值的0.1
-            self.ir_ax.set_ylim(min_val, max_val)
         else:
             # 如果没有数据，则设置一个默认范围
-            self.ir_ax.set_ylim(0, 10)
-        self.ir_canvas.draw_idle()
+            min_val, max_val = 0, 10
+        # Only touch the axis when the data leaves the range currently shown
+        if self.ir_ylim is None or min_val < self.ir_ylim[0] or max_val > self.ir_ylim[1]:
+            self.ir_ylim = self.padded_range(min_val, max_val)
+            self.ir_plot.setYRange(*self.ir_ylim, padding=0)
 
-    def reset_plot(self):
+    def padded_range(self, min_val, max_val):
+        """Widen a y range by YRANGE_MARGIN of its span on both sides"""
+        margin = (max_val - min_val) * YRANGE_MARGIN
+        return min_val - margin, max_val + margin
 
-        print(self.count)
+    def reset_plot(self):
         self.count = 0
-        self.ecg_data = []
-        self.ecg_time_stamps = []
-        self.start_time = time.time()  # 重置起始时间
-        self.ecg_line.set_data([], [])
-        self.ecg_canvas.draw_idle()
-
-        self.ir_data = []
-        self.ir_time_stamps = []
+        # The buffers are reused: forgetting the samples is enough
+        self.plot_head = 0
+        self.plot_count = 0
+        self.ecg_ylim = None
+        self.ir_ylim = None
+        self.reset_extrema()
         self.start_time = time.time()  # 重置起始时间
-        self.ir_line.set_data([], [])
-        self.ir_canvas.draw_idle()
+        self.ecg_curve.setData([], [])
+        self.ir_curve.setData([], [])
 
     def update_heart_rate_display(self, heart_rate_value):
         """Update the heart rate QTextBrowser with new value"""
         heart_rate_text = f"Heart Rate: {heart_rate_value} bpm"
-        self.heartrate.setText(heart_rate_text)
+        # The value is emitted for every packet but rarely changes, so only re-layout the text when it does
+        if heart_rate_text != self.heart_rate_text:
+            self.heart_rate_text = heart_rate_text
+            self.heartrate.setText(heart_rate_text)
 
     def update_spo2_display(self, spo2_value):
         """ Update the SpO2 QTextBrowser with new value """
         if spo2_value != "SpO2: N/A":
             spo2_text = spo2_value
-            self.spO2.setText(spo2_text)
-            self.spO2.setStyleSheet("QTextBrowser {\n"
-                                    "  background-color: rgb(143, 0, 2);\n"
-                                    "  color:#ffe6e9; /* 文字颜色为白色 */\n"
-                                    "  font-size: 18pt;\n"
-                                    "  font-weight: bold; /* 字体加粗 */\n"
-                                    "  font-family: \'Arial\'; \n"
-                                    "  text-align: center; \n"
-                                    "  border-radius: 15px;\n"
-                                    "}")
+            self.set_spo2_text(spo2_text)
             self.last_valid_spo2 = spo2_text
             if self.spo2_timer.isActive():  # 检查计时器是否激活
                 self.spo2_timer.stop()  # 如果计时器还在运行，停止它
         else:
 
             if not self.spo2_timer.isActive():  # 只有当计时器不在运行时才进行处理
-                self.spO2.setText(self.last_valid_spo2)  # 显示最后有效的值
+                self.set_spo2_text(self.last_valid_spo2)  # 显示最后有效的值
                 self.spo2_timer.start(2000)  # 开始计时器，3秒后改变显示
 
     def on_spo2_timer_timeout(self):
-        self.spO2.setText("SpO2: N/A")  # 计时结束后设置显示为"N/A"
-        self.spO2.setStyleSheet("QTextBrowser {\n"
-                                "  background-color: rgb(143, 0, 2);\n"
-                                "  color:#ffe6e9; /* 文字颜色为白色 */\n"
-                                "  font-size: 18pt;\n"
-                                "  font-weight: bold; /* 字体加粗 */\n"
-                                "  font-family: \'Arial\'; \n"
-                                "  text-align: center; \n"
-                                "  border-radius: 15px;\n"
-                                "}")
+        self.set_spo2_text("SpO2: N/A")  # 计时结束后设置显示为"N/A"
         self.spo2_timer.start(2000)  # 确保停止计时器
 
+    def set_spo2_text(self, spo2_text):
+        """Show the given SpO2 text, skipping the QTextBrowser update when it is already displayed"""
+        if spo2_text != self.spo2_text:
+            self.spo2_text = spo2_text
+            self.spO2.setText(spo2_text)
+
     def change_data_source(self, id):
         if id == 1:
             self.using_ble = True
@@ -732,7 +923,7 @@ class BLEConnectionDialog(QtWidgets.QDialog, ):
     def __init__(self, parent=None, ui=None):
         super(BLEConnectionDialog, self).__init__(parent)
         self.ui = ui
-        self.manager = None
+        self.manager = None  # Manager of the latest scan, kept apart from the connection in ui.ble_manager
         self.setWindowTitle("Connect to Bluetooth")
         self.setFixedSize(500, 400)  # Updated size
         layout = QtWidgets.QVBoxLayout()
@@ -763,43 +954,35 @@ class BLEConnectionDialog(QtWidgets.QDialog, ):
 
         self.setLayout(layout)
         self.apply_style()
+        # Connected once here; connecting per scan or connection attempt showed every message several times
+        self.update_status_signal.connect(self.show_status_message)
 
     def scan_for_devices(self):
-        def thread_target():
-            device_name = self.device_name_input.text()
-            self.ui.ble_manager = BluetoothManager(device_name=device_name, mac_address=None, uuid=None, ui=self.ui,
-                                            dialog=self)
-            self.update_status_signal.connect(self.show_status_message)
-            self.ui.ble_manager.start_scan()
-        self.ui.ble_thread = threading.Thread(target=thread_target)
-        self.ui.ble_thread.daemon = True
-        self.ui.ble_thread.start()
+        # The scan runs on the Bluetooth module's own event loop thread, start_scan returns immediately.
+        # Only start_bluetooth replaces ui.ble_manager, a scan must not orphan a live connection
+        device_name = self.device_name_input.text()
+        self.manager = BluetoothManager(device_name=device_name, mac_address=None, uuid=None, ui=self.ui, dialog=self)
+        self.manager.start_scan()
 
     def connect_to_custom_device(self):
         mac_address = self.mac_address_input.text()
         device_name = self.device_name_input.text()
         uuid = self.uuid_input.text()
-        self.start_bluetooth_thread(mac_address, device_name, uuid)
+        self.start_bluetooth(mac_address, device_name, uuid)
 
     def connect_to_default_device(self):
         mac_address = "09:65:01:0b:5e:7e"
         uuid = "0000ffe1-0000-1000-8000-00805f9b34fb"
-        self.start_bluetooth_thread(mac_address, None, uuid)
+        self.start_bluetooth(mac_address, None, uuid)
 
     def show_status_message(self, message):
         QtWidgets.QMessageBox.information(self, "Connection Status", message)
 
-    def start_bluetooth_thread(self, mac_address, device_name, uuid):
-        def thread_target():
-
-            self.ui.ble_manager = BluetoothManager(device_name=device_name, mac_address=mac_address, uuid=uuid, ui=self.ui,
-                                            dialog=self)
-            self.update_status_signal.connect(self.show_status_message)
-            self.ui.ble_manager.start()
-
-        self.ui.ble_thread = threading.Thread(target=thread_target)
-        self.ui.ble_thread.daemon = True
-        self.ui.ble_thread.start()
+    def start_bluetooth(self, mac_address, device_name, uuid):
+        # The connection runs on the Bluetooth module's own event loop thread, start returns immediately
+        self.ui.ble_manager = BluetoothManager(device_name=device_name, mac_address=mac_address, uuid=uuid, ui=self.ui,
+                                               dialog=self)
+        self.ui.ble_manager.start()
 
     def apply_style(self):
         self.setStyleSheet("""
@@ -28,9 +28,16 @@ current sample.
 
 To use this script, you need to create an instance of the ECGRespirationAlgorithm class. Then, you can use the
 process_current_sample method to process the current sample, the QRS_algorithm_interface method to process the
-current sample with the QRS algorithm, and the other methods as needed."""
+current sample with the QRS algorithm, and the other methods as needed.
+
+When Numba is installed, the FIR dot product in ecg_filter_process is compiled to native code."""
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional, ecg_filter_process uses np.dot without it
+    njit = None
+
 # Constants
 FILTER_ORDER = 161
 MAX_PEAK_TO_SEARCH = 4
@@ -59,28 +66,46 @@ CoeffBuf_40Hz_LowPass = np.array([
     -108, -87, 177, -64, -117, 160, -21, -137, 135,
     20, -147, 104, 55, -146, 70, 84, -137, 34,
     105, -121, 0, 117, -99, -31, 122, -72
-])
+], dtype=np.int64)  # Fixed width, so the accumulator does not depend on the platform's default integer
 
+# The working buffer holds float64 samples. A float64 copy of the coefficients lets np.dot run as a single BLAS dot
+# product instead of converting the integer coefficients on every call, and integer products of these magnitudes are
+# exact in float64.
+CoeffBuf_40Hz_LowPass_F64 = CoeffBuf_40Hz_LowPass.astype(np.float64)
+# The low pass filter is linear phase, tap k equals tap FILTER_ORDER - 1 - k
+LowPass_Symmetric = bool(np.array_equal(CoeffBuf_40Hz_LowPass, CoeffBuf_40Hz_LowPass[::-1]))
 
-def ecg_filter_process(working_buff, coeff_buf):
+
+def ecg_filter_process(working_buff, coeff_buf, start=0, symmetric=False):
     """
     Process the ECG filter.
 
+    The working buffer is a circular buffer, so the filter output is the dot product of the coefficients with its
+    two contiguous halves, oldest sample first. Only the one output for the newest sample is computed.
+
     Parameters:
     - working_buff: The working buffer.
     - coeff_buf: The coefficient buffer.
+    - start: Index of the oldest sample in the working buffer.
+    - symmetric: Whether the coefficients are symmetric, which lets the compiled filter fold the taps.
 
     Returns:
     - filter_out: The output of the filter.
     """
     # Perform the multiply-accumulate operation using dot product
-    acc = np.dot(coeff_buf, working_buff)
-    filtered_output = np.convolve(working_buff, coeff_buf, 'valid')
+    if fir_dot is not None:
+        acc = (fir_dot_folded if symmetric else fir_dot)(working_buff, coeff_buf, start)
+    else:
+        split = len(working_buff) - start
+        acc = np.dot(coeff_buf[:split], working_buff[start:]) + np.dot(coeff_buf[split:], working_buff[:start])
 
     acc = int(acc)  # Convert to Python native int
 
-    # Saturate the result to emulate fixed-point overflow behavior
-    acc = max(min(acc, 0x3fffffff), -0x40000000)
+    # Saturate the result to emulate fixed-point overflow behavior, with comparisons instead of min()/max() calls
+    if acc > 0x3fffffff:
+        acc = 0x3fffffff
+    elif acc < -0x40000000:
+        acc = -0x40000000
 
     # Convert from Q30 to Q15 by right shifting 15
     filter_out = np.int16(acc >> 15)
@@ -88,6 +113,63 @@ def ecg_filter_process(working_buff, coeff_buf):
     return filter_out
 
 
+def _fir_dot(working_buff, coeff_buf, start):
+    """
+    Multiply-accumulate loop of the FIR filter over the circular working buffer, compiled with Numba when it is
+    available. Without the two slices and the two np.dot calls the compiled loop needs no temporary arrays.
+
+    Parameters:
+    - working_buff: The working buffer.
+    - coeff_buf: The coefficient buffer.
+    - start: Index of the oldest sample in the working buffer.
+
+    Returns:
+    - acc: The accumulated filter output before saturation.
+    """
+    split = len(working_buff) - start
+    acc = 0.0
+    for k in range(split):
+        acc += coeff_buf[k] * working_buff[start + k]
+    for k in range(start):
+        acc += coeff_buf[split + k] * working_buff[k]
+    return acc
+
+
+def _fir_dot_folded(working_buff, coeff_buf, start):
+    """
+    Variant of _fir_dot for symmetric coefficients, which adds the two samples sharing a coefficient before
+    multiplying and so needs half the multiplications.
+
+    Parameters:
+    - working_buff: The working buffer.
+    - coeff_buf: The coefficient buffer, equal to its reverse.
+    - start: Index of the oldest sample in the working buffer.
+
+    Returns:
+    - acc: The accumulated filter output before saturation.
+    """
+    n = len(working_buff)
+    i = start  # Walks forward from the oldest sample
+    j = start - 1 if start > 0 else n - 1  # Walks backward from the newest sample
+    acc = 0.0
+    for k in range(n // 2):
+        acc += coeff_buf[k] * (working_buff[i] + working_buff[j])
+        i += 1
+        if i == n:
+            i = 0
+        j -= 1
+        if j < 0:
+            j = n - 1
+    if n % 2:
+        acc += coeff_buf[n // 2] * working_buff[i]  # Centre tap
+    return acc
+
+
+# The plain Python loops are slower than np.dot, so they are only used once compiled
+fir_dot = njit(cache=True)(_fir_dot) if njit is not None else None
+fir_dot_folded = njit(cache=True)(_fir_dot_folded) if njit is not None else None
+
+
 class ECGRespirationAlgorithm:
     """
     Class to implement the ECG Respiration Algorithm.
@@ -97,7 +179,7 @@ class ECGRespirationAlgorithm:
         """
         Initialize the ECGRespirationAlgorithm.
         """
-        self.ecg_buffer = np.zeros(FILTER_ORDER)
+        self.ecg_buffer = np.zeros(FILTER_ORDER, dtype=np.float64)
         self.resp_buffer = np.zeros(FILTER_ORDER)
 
         self.first_flag = True
@@ -112,8 +194,11 @@ class ECGRespirationAlgorithm:
         self.qrs_threshold_new = 0
         self.first_peak_detected = False
         self.heart_rate = 0
-        self.qrs_samples = [0] * 5  # For QRS_Second_Prev_Sample to QRS_Second_Next_Sample
+        self.qrs_samples = [0] * 5  # For QRS_Second_Prev_Sample to QRS_Second_Next_Sample, used as a delay line
+        self.qrs_pos = 0  # Slot of qrs_samples holding the oldest sample
         self.prev_data = np.zeros(32, dtype=np.int16)
+        self.prev_pos = 0  # Slot of prev_data holding the oldest sample
+        self.prev_sum = 0  # Running sum of prev_data for the moving average
 
         self.sample_count = 0
         self.nopeak_count = 0
@@ -156,9 +241,6 @@ class ECGRespirationAlgorithm:
         # Store the DC removed value in the working buffer
         self.ecg_buffer[self.buf_start] = ecg_data
 
-        # Prepare data for filtering
-        filtered_output = ecg_filter_process(self.ecg_buffer, CoeffBuf_40Hz_LowPass)
-
         # Rotate the buffer
         self.buf_start += 1
 
@@ -166,6 +248,10 @@ class ECGRespirationAlgorithm:
         if self.buf_start == FILTER_ORDER:
             self.buf_start = 0
 
+        # Filter with the oldest sample, which the next sample will overwrite, at the start of the window
+        filtered_output = ecg_filter_process(self.ecg_buffer, CoeffBuf_40Hz_LowPass_F64, self.buf_start,
+                                             LowPass_Symmetric)
+
         return filtered_output
 
     def QRS_algorithm_interface(self, curr_sample):
@@ -175,16 +261,20 @@ class ECGRespirationAlgorithm:
         Parameters:
         - curr_sample: The current sample to process.
         """
-        # Shift previous data for new incoming sample
-        self.prev_data[1:] = self.prev_data[:-1]
-        self.prev_data[0] = curr_sample
+        # Replace the oldest of the previous samples with the new one, keeping their sum up to date
+        pos = self.prev_pos
+        old = int(self.prev_data[pos])
+        self.prev_data[pos] = curr_sample
+        self.prev_sum += int(self.prev_data[pos]) - old
+        self.prev_pos = (pos + 1) % len(self.prev_data)
 
         # Moving average calculation
-        mac = np.mean(self.prev_data)
+        mac = self.prev_sum / len(self.prev_data)
         curr_sample = int(mac)  # Simulate bit shift by 2 (/4) with int cast
 
-        # Update the sample pipeline
-        self.qrs_samples = [curr_sample] + self.qrs_samples[:-1]
+        # Update the sample pipeline, overwriting the oldest sample in place
+        self.qrs_samples[self.qrs_pos] = curr_sample
+        self.qrs_pos = (self.qrs_pos + 1) % len(self.qrs_samples)
 
         # Process the buffer to detect QRS complex
         self.QRS_process_buffer()
@@ -193,8 +283,8 @@ class ECGRespirationAlgorithm:
         """
         Process the buffer to detect QRS complex.
         """
-        QRS_Prev_Sample = self.qrs_samples[-2]  # Second last sample
-        QRS_Next_Sample = self.qrs_samples[-1]  # Last sample
+        QRS_Prev_Sample = self.qrs_samples[(self.qrs_pos + 1) % len(self.qrs_samples)]  # Second oldest sample
+        QRS_Next_Sample = self.qrs_samples[self.qrs_pos]  # Oldest sample
         # Calculating first derivative
         first_derivative = QRS_Next_Sample - QRS_Prev_Sample
 
@@ -7,7 +7,7 @@ Key Components:
 - State Machine: Manages the reception of data packets from a serial connection, parsing them according to
   a specific protocol defined by start bytes, length, and type fields.
 - Data Conversion: Converts ADC readings to voltages for further processing.
-- ECG and SpO2 Processing: Utilizes the ECGRespirationAlgorithm and the estimate_spo2 function to process
+- ECG and SpO2 Processing: Utilizes the ECGRespirationAlgorithm and Spo2Estimator classes to process
   the incoming data for real-time monitoring and analysis.
 
 The module also defines packet constants, initializes global variables for packet processing, and maintains
@@ -16,18 +16,26 @@ emit status signals based on processed data.
 
 Dependencies:
 - heartrate_algorithm: Contains the ECGRespirationAlgorithm class for processing ECG signals.
-- spo2_algorithm: Includes the estimate_spo2 function to calculate SpO2 from IR and red light sensor data.
+- spo2_algorithm: Includes the Spo2Estimator class to calculate SpO2 from IR and red light sensor data.
 - numpy: Used for numerical operations, especially in the handling of data lists and conversion calculations.
+- numba (optional): Compiles the packet decoder used by process_data_bulk to native code when installed.
 
 This script is typically employed in settings where continuous monitoring of patients is required, such as
 hospitals or personal health monitoring devices. It is designed to run on systems that support Python execution
 and have the necessary hardware interfaces for receiving serial data.
 """
 
+from collections import deque
+
 from heartrate_algorithm import ECGRespirationAlgorithm
-from spo2_algorithm import estimate_spo2
+from spo2_algorithm import Spo2Estimator
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional, parse_rx_buffer falls back to a NumPy scan without it
+    njit = None
+
 # Packet state constants for managing data packet reception
 CESState_Init = 0
 CESState_SOF1_Found = 1
@@ -42,156 +50,357 @@ CES_CMDIF_IND_LEN = 2
 CES_CMDIF_IND_LEN_MSB = 3
 CES_CMDIF_IND_PKTTYPE = 4
 CES_CMDIF_PKT_OVERHEAD = 5
+CES_SOF = bytes((CES_CMDIF_PKT_START_1, CES_CMDIF_PKT_START_2))  # Start-of-frame sequence searched for in bulk data
+CES_CMDIF_PKT_DATA_LEN = 6  # Payload bytes of a data packet: ECG, IR and Red as little-endian 16-bit values
 
 # Initialize global variables
-CES_Data_Counter = 0
-CES_Pkt_Len = 0
-CES_Pkt_PktType = 0
 ecg_value = 0
 ir_value = 0
 red_value = 0
 BUFFER_SIZE = 100  # Buffer size for data storage
 ecg_mV = 0
-pc_rx_state = CESState_Init  # Initial state of the packet receiver
-CES_Pkt_Pos_Counter = 0
-CES_Pkt_Data_Counter = [0, 0, 0, 0, 0, 0]
-ir_samples = []  # List to store IR samples
-red_samples = []  # List to store Red light samples
-ecg_samples = []
+# Ring buffers of the latest IR and Red light samples. Every sample is stored twice, BUFFER_SIZE slots apart, so the
+# window in sample order is always the contiguous view ring[ring_idx:ring_idx + BUFFER_SIZE]
+ir_ring = np.zeros(2 * BUFFER_SIZE, dtype=np.int32)
+red_ring = np.zeros(2 * BUFFER_SIZE, dtype=np.int32)
+ring_idx = 0  # Slot the next sample is written to, the oldest sample once the rings are full
+ring_full = False  # Whether the rings hold BUFFER_SIZE samples yet
+SPO2_INTERVAL = 25  # Packets between SpO2 estimates, about 5 estimates per second at 125 Hz
+spo2_countdown = 0  # Packets left until the next SpO2 estimate
+last_spo2 = None  # Result of the latest SpO2 estimate, used for the packets in between
+last_spo2_heart_rate = None
+ecg_samples = deque(maxlen=BUFFER_SIZE)  # Latest ECG samples in millivolts, the oldest is evicted automatically
 heart_rate = None
+RX_BUF_SIZE = 4096  # Size of the receive buffer used by process_data_bulk
+rx_buf = bytearray(RX_BUF_SIZE)  # Preallocated receive buffer, starts with the tail of a partially received packet
+rx_len = 0  # Number of valid bytes in rx_buf
+PACKET_SIZE = CES_CMDIF_PKT_OVERHEAD + CES_CMDIF_PKT_DATA_LEN + 2  # Size of a data packet with ECG, IR and Red values
+frame_buf = np.empty((RX_BUF_SIZE // PACKET_SIZE + 1, 3), dtype=np.int32)  # ECG, IR and Red values decoded per packet
 ecg_processor = ECGRespirationAlgorithm()
+spo2_estimator = Spo2Estimator(BUFFER_SIZE)  # Keeps its scratch buffers between estimates
+
+
+class PacketParser:
+    """
+        State machine that parses the custom packets of the medical device one byte at a time.
+
+        The parser state lives in slots of one object instead of module globals, so the per-byte path only touches
+        local attribute slots.
+        """
+    __slots__ = ('state', 'pkt_len', 'pkt_type', 'pos', 'data_count', 'data')
+
+    def __init__(self):
+        self.state = CESState_Init  # Initial state of the packet receiver
+        self.pkt_len = 0
+        self.pkt_type = 0
+        self.pos = 0  # Position of the current byte within the packet
+        self.data_count = 0  # Number of payload bytes stored in data
+        self.data = [0] * CES_CMDIF_PKT_DATA_LEN
+
+    def feed(self, rx_char, ui):
+        """
+            Processes the next byte and handles the packet once it is complete.
+
+            Parameters:
+            - rx_char: The next byte received from the serial interface, representing part of a data packet.
+            - ui: A reference to the user interface object, passed on to process_packet for a complete packet.
+
+            The state machine has states for packet initialization (CESState_Init), start-of-frame detection
+            (CESState_SOF1_Found, CESState_SOF2_Found) and for reading the packet length, type and payload
+            (CESState_PktLen_Found).
+            """
+        state = self.state
+
+        # Initial state: looking for the first byte of the packet start sequence
+        if state == CESState_Init:
+            if rx_char == CES_CMDIF_PKT_START_1:
+                self.state = CESState_SOF1_Found
+
+        # State after finding the first start byte, looking for the second
+        elif state == CESState_SOF1_Found:
+            if rx_char == CES_CMDIF_PKT_START_2:
+                self.state = CESState_SOF2_Found
+            else:
+                self.state = CESState_Init  # Reset to initial if the sequence breaks
+
+        # State after finding the start sequence, next byte should be packet length
+        elif state == CESState_SOF2_Found:
+            self.state = CESState_PktLen_Found
+            self.pkt_len = rx_char
+            self.pos = CES_CMDIF_IND_LEN
+            self.data_count = 0
+
+        # Reading the packet length and type
+        elif state == CESState_PktLen_Found:
+            pos = self.pos = self.pos + 1
+            if pos < CES_CMDIF_PKT_OVERHEAD:
+                if pos == CES_CMDIF_IND_LEN_MSB:
+                    self.pkt_len = (rx_char << 8) | self.pkt_len  # Update packet length with MSB
+                elif pos == CES_CMDIF_IND_PKTTYPE:
+                    self.pkt_type = rx_char  # Update packet type
+            elif pos < CES_CMDIF_PKT_OVERHEAD + self.pkt_len + 1:
+                if self.pkt_type == 2:  # Specific packet type processing
+                    if self.data_count < CES_CMDIF_PKT_DATA_LEN:
+                        self.data[self.data_count] = rx_char
+                        self.data_count += 1
+
+            # Check for packet completion
+            else:
+                if rx_char == CES_CMDIF_PKT_STOP:
+                    # Processing received data
+                    data = self.data
+                    ir = data[2] | (data[3] << 8)
+                    mv = process_packet(data[0] | (data[1] << 8), ir, data[4] | (data[5] << 8), ui)
+                    ui.add_data(mv, ir)
+
+                    # Reset state and counters for the next packet
+                    self.data_count = 0
+                # Whether or not the packet ended correctly, look for the next one
+                self.state = CESState_Init
+
+
+packet_parser = PacketParser()  # Parser state used by process_data
 
 
 def process_data(rx_char, ui):
     """
-        Processes incoming serial data based on a state machine to parse custom packets for a medical device.
+        Processes incoming serial data one byte at a time, using the module's packet_parser state machine.
 
-        This function manages state transitions based on incoming bytes (rx_char) to construct data packets that
-        include physiological parameters such as ECG and SpO2. Upon successfully receiving a complete packet,
-        the function updates global variables and UI components with new data, and resets its state to be ready
-        for the next packet.
+        Upon successfully receiving a complete packet, the latest physiological values are updated through
+        process_packet and the sample is added to the plots.
 
         Parameters:
         - rx_char: The next byte received from the serial interface, representing part of a data packet.
         - ui: A reference to the user interface object, which allows the function to update the UI and emit signals
           based on received data.
+        """
+    packet_parser.feed(rx_char, ui)
 
-        Global Variables:
-        - pc_rx_state: Current state of the packet processing state machine.
-        - CES_Pkt_Pos_Counter, CES_Pkt_Data_Counter, CES_Pkt_Len, CES_Pkt_PktType: Variables to manage packet parsing.
-        - ecg_value, ir_value, red_value, ecg_mV: Variables to store the latest values of physiological parameters.
-        - ecg_samples, ir_samples, red_samples: Lists to store time series data for plotting or analysis.
-        - heart_rate: Variable to store the latest calculated heart rate.
 
-        The function utilizes a state machine with states for packet initialization (CESState_Init), start-of-frame
-        detection (CESState_SOF1_Found, CESState_SOF2_Found), packet length and type reading (CESState_PktLen_Found),
-        and data handling to extract and convert packet data into meaningful physiological measurements.
+def process_data_bulk(buf, ui):
+    """
+        Processes a whole chunk of received bytes at once instead of feeding the state machine byte by byte.
+
+        The bytes are copied into the preallocated receive buffer rx_buf behind any partial packet left over from
+        the previous call, and the buffer is then parsed by parse_rx_buffer. Packets may therefore span several BLE
+        notifications or serial reads.
+
+        Parameters:
+        - buf: A bytes-like object (bytes, bytearray or memoryview) holding the received data.
+        - ui: A reference to the user interface object, passed on to process_packet for every complete packet.
         """
-    # Global variable declaration for shared state and data across function calls
-    global pc_rx_state, CES_Pkt_Pos_Counter, ecg_value, ir_value, red_value, CES_Data_Counter, CES_Pkt_Len
-    global CES_Pkt_PktType, ecg_mV, ecg_samples, ir_samples, red_samples, heart_rate, ecg_mV
-
-    # Initial state: looking for the first byte of the packet start sequence
-    if pc_rx_state == CESState_Init:
-        if rx_char == CES_CMDIF_PKT_START_1:
-            pc_rx_state = CESState_SOF1_Found
-
-    # State after finding the first start byte, looking for the second
-    elif pc_rx_state == CESState_SOF1_Found:
-        if rx_char == CES_CMDIF_PKT_START_2:
-            pc_rx_state = CESState_SOF2_Found
-        else:
-            pc_rx_state = CESState_Init  # Reset to initial if the sequence breaks
-
-    # State after finding the start sequence, next byte should be packet length
-    elif pc_rx_state == CESState_SOF2_Found:
-        pc_rx_state = CESState_PktLen_Found
-        CES_Pkt_Len = rx_char
-        CES_Pkt_Pos_Counter = CES_CMDIF_IND_LEN
-        CES_Data_Counter = 0
-
-    # Reading the packet length and type
-    elif pc_rx_state == CESState_PktLen_Found:
-        CES_Pkt_Pos_Counter += 1
-        if CES_Pkt_Pos_Counter < CES_CMDIF_PKT_OVERHEAD:
-            if CES_Pkt_Pos_Counter == CES_CMDIF_IND_LEN_MSB:
-                CES_Pkt_Len = (rx_char << 8) | CES_Pkt_Len  # Update packet length with MSB
-            elif CES_Pkt_Pos_Counter == CES_CMDIF_IND_PKTTYPE:
-                CES_Pkt_PktType = rx_char  # Update packet type
-        elif CES_CMDIF_PKT_OVERHEAD <= CES_Pkt_Pos_Counter < CES_CMDIF_PKT_OVERHEAD + CES_Pkt_Len + 1:
-            if CES_Pkt_PktType == 2:  # Specific packet type processing
-                if CES_Data_Counter < len(CES_Pkt_Data_Counter):
-                    CES_Pkt_Data_Counter[CES_Data_Counter] = rx_char
-                    CES_Data_Counter += 1
-
-        # Check for packet completion
-        else:
-            if rx_char == CES_CMDIF_PKT_STOP:
-                # Processing received data
-                ecg_value = CES_Pkt_Data_Counter[0] | (CES_Pkt_Data_Counter[1] << 8)
-                ir_value = CES_Pkt_Data_Counter[2] | (CES_Pkt_Data_Counter[3] << 8)
-                red_value = CES_Pkt_Data_Counter[4] | (CES_Pkt_Data_Counter[5] << 8)
-                ecg_mV = adc_to_voltage(ecg_value, ui.resolution_bits)
-                ecg_samples.append(ecg_mV)
-                ecg_processor.QRS_algorithm_interface(ecg_value)
-                heart_rate = ecg_processor.heart_rate
-                ui.add_data(ecg_mV, ir_value)
-                ecg_samples.append(ecg_mV)
-                ir_samples.append(ir_value)
-                red_samples.append(red_value)
-
-                if len(ir_samples) > BUFFER_SIZE:
-                    ir_samples.pop(0)
-                if len(red_samples) > BUFFER_SIZE:
-                    red_samples.pop(0)
-
-                # Update UI and record data
-                spo2_value = None
-                if len(ir_samples) >= BUFFER_SIZE and len(red_samples) >= BUFFER_SIZE:
-                    spo2_value, heart_rate = estimate_spo2(ir_samples[-BUFFER_SIZE:], red_samples[-BUFFER_SIZE:])
-                    if 60 <= heart_rate <= 140:
-                        ui.heart_rate_signal.emit(str(int(heart_rate)))  # Emit heart rate
-                    if spo2_value is not None:
-                        spo2_text = f"SpO2: {spo2_value}%"
-                    else:
-                        spo2_text = "SpO2: N/A"
-                    ui.spo2_update_signal.emit(spo2_text)
-                if ui.is_recording_data:
-                    ui.record_data(adc_to_voltage(ecg_value, ui.resolution_bits), ir_value, red_value, spo2_value)
-
-                # Reset state and counters for the next packet
-                pc_rx_state = CESState_Init
-                CES_Data_Counter = 0
+    global rx_len
+
+    mv = memoryview(buf)
+    step = RX_BUF_SIZE // 2
+    for i in range(0, len(mv), step):
+        chunk = mv[i:i + step]
+        n = len(chunk)
+        if rx_len + n > RX_BUF_SIZE:
+            # The parsers keep at most one packet pending, so this is only a last resort. Drop the packet that never
+            # completed but keep the bytes from the last start candidate after it, which may be a valid packet
+            last = rx_buf.rfind(CES_SOF, 1, rx_len)
+            if last < 0 or rx_len - last + n > RX_BUF_SIZE:
+                rx_len = 0
             else:
-                # If packet does not end correctly, reset to initial state
-                pc_rx_state = CESState_Init
+                rx_len -= last
+                rx_buf[:rx_len] = rx_buf[last:last + rx_len]
+        rx_buf[rx_len:rx_len + n] = chunk
+        rx_len += n
+        parse_rx_buffer(ui)
 
 
-def adc_to_voltage(adc_value, resolution_bits):
+def parse_rx_buffer(ui):
     """
-    Converts an ADC value to a corresponding voltage in millivolts.
+        Parses all complete packets in the receive buffer and moves a trailing incomplete packet to its start.
+
+        The packets are decoded by the Numba compiled decode_frames when Numba is installed and by scan_frames
+        otherwise. The plot samples of all packets found are handed to the user interface in one
+        data_batch_signal emission.
+
+        Parameters:
+        - ui: A reference to the user interface object, passed on to process_packet for every complete packet.
+        """
+    global rx_len
+
+    n = rx_len
+    if decode_frames is not None:
+        count, keep = decode_frames(np.frombuffer(rx_buf, dtype=np.uint8, count=n), n, frame_buf)
+        frames = frame_buf[:count].tolist()
+    else:
+        frames, keep = scan_frames(n)
+
+    rx_len = n - keep
+    rx_buf[:rx_len] = rx_buf[keep:n]
+
+    if frames:
+        ecg_batch = [process_packet(ecg, ir, red, ui) for ecg, ir, red in frames]
+        ir_batch = [frame[1] for frame in frames]
+        ui.data_batch_signal.emit(np.array(ecg_batch, dtype=np.float32), np.array(ir_batch, dtype=np.float32))
 
-    This function takes a digital value from an ADC (Analog to Digital Converter)
-    and converts it to the corresponding analog voltage in millivolts. The conversion
-    depends on the reference voltage and the resolution of the ADC.
+
+def scan_frames(n):
+    """
+        Finds the data packets in the first n bytes of the receive buffer.
+
+        Start-of-frame candidates are located with bytearray.find, which searches in C, several bytes at a time,
+        instead of comparing each byte in Python. Each candidate is validated against its length field, which has to
+        be CES_CMDIF_PKT_DATA_LEN, and its stop byte. A corrupted packet is skipped by resynchronising on the next
+        candidate, one byte further on, so a bad length field cannot hold back the packets behind it.
+
+        Parameters:
+        - n: The number of valid bytes in rx_buf.
+
+        Returns:
+        - frames: A list of (ecg, ir, red) raw values, one per complete data packet.
+        - keep: The index of the first byte that has to wait for the next chunk.
+        """
+    keep = n  # Start of the bytes that have to wait for the next chunk
+    frames = []
+    pos = 0
+    start = rx_buf.find(CES_SOF, 0, n)
+    while start >= 0:
+        if start + CES_CMDIF_PKT_OVERHEAD > n:
+            keep = start  # Header incomplete, wait for more data
+            break
+        pkt_len = rx_buf[start + CES_CMDIF_IND_LEN] | (rx_buf[start + CES_CMDIF_IND_LEN_MSB] << 8)
+        if pkt_len != CES_CMDIF_PKT_DATA_LEN:
+            # Corrupted length field, resynchronise on the next start candidate
+            start = rx_buf.find(CES_SOF, start + 1, n)
+            continue
+        stop = start + CES_CMDIF_PKT_OVERHEAD + pkt_len + 1
+        if stop >= n:
+            keep = start  # Packet incomplete, wait for more data
+            break
+        if rx_buf[stop] != CES_CMDIF_PKT_STOP:
+            # Not a valid packet, resynchronise on the next start candidate
+            start = rx_buf.find(CES_SOF, start + 1, n)
+            continue
+        if rx_buf[start + CES_CMDIF_IND_PKTTYPE] == 2:
+            frames.append(np.frombuffer(rx_buf, dtype='<u2', count=3, offset=start + CES_CMDIF_PKT_OVERHEAD).tolist())
+        pos = stop + 1
+        start = rx_buf.find(CES_SOF, pos, n)
+    else:
+        # A trailing first start byte may be the beginning of a packet split across chunks
+        if n and rx_buf[n - 1] == CES_CMDIF_PKT_START_1 and n - 1 >= pos:
+            keep = n - 1
+
+    return frames, keep
+
+
+def _decode_frames(buf, n, out):
+    """
+        Byte loop equivalent of scan_frames, compiled with Numba when it is available.
+
+        Parameters:
+        - buf: A uint8 NumPy view of the receive buffer.
+        - n: The number of valid bytes in buf.
+        - out: An int32 array of shape (packets, 3) that receives the ECG, IR and Red values of each packet.
+
+        Returns:
+        - count: The number of packets written to out.
+        - keep: The index of the first byte that has to wait for the next chunk.
+        """
+    count = 0
+    i = 0
+    while i < n - 1:
+        if buf[i] != CES_CMDIF_PKT_START_1 or buf[i + 1] != CES_CMDIF_PKT_START_2:
+            i += 1
+            continue
+        if i + CES_CMDIF_PKT_OVERHEAD > n:
+            return count, i  # Header incomplete, wait for more data
+        pkt_len = int(buf[i + CES_CMDIF_IND_LEN]) | (int(buf[i + CES_CMDIF_IND_LEN_MSB]) << 8)
+        if pkt_len != CES_CMDIF_PKT_DATA_LEN:
+            i += 1  # Corrupted length field, resynchronise on the next start candidate
+            continue
+        stop = i + CES_CMDIF_PKT_OVERHEAD + pkt_len + 1
+        if stop >= n:
+            return count, i  # Packet incomplete, wait for more data
+        if buf[stop] != CES_CMDIF_PKT_STOP:
+            i += 1  # Not a valid packet, resynchronise on the next start candidate
+            continue
+        if buf[i + CES_CMDIF_IND_PKTTYPE] == 2:
+            data = i + CES_CMDIF_PKT_OVERHEAD
+            out[count, 0] = int(buf[data]) | (int(buf[data + 1]) << 8)
+            out[count, 1] = int(buf[data + 2]) | (int(buf[data + 3]) << 8)
+            out[count, 2] = int(buf[data + 4]) | (int(buf[data + 5]) << 8)
+            count += 1
+        i = stop + 1
+    # A trailing first start byte may be the beginning of a packet split across chunks
+    if i < n and buf[n - 1] == CES_CMDIF_PKT_START_1:
+        return count, n - 1
+    return count, n
+
+
+# The plain Python byte loop is slower than scan_frames, so it is only used once compiled
+decode_frames = njit(cache=True)(_decode_frames) if njit is not None else None
+
+
+def process_packet(ecg, ir, red, ui):
+    """
+        Handles one complete data packet: converts the raw values, runs the heart rate and SpO2 algorithms and
+        updates the heart rate and SpO2 displays. Plotting is left to the caller, so that samples can be batched.
+
+        Parameters:
+        - ecg: The raw ECG ADC value of the packet.
+        - ir: The raw IR value of the packet.
+        - red: The raw Red light value of the packet.
+        - ui: A reference to the user interface object.
+
+        Returns:
+        - The ECG value converted to millivolts.
+        """
+    global ecg_value, ir_value, red_value, ecg_mV, heart_rate, ring_idx, ring_full
+    global spo2_countdown, last_spo2, last_spo2_heart_rate
+
+    ecg_value = ecg
+    ir_value = ir
+    red_value = red
+    ecg_mV = ecg_value * ui.adc_scale  # Millivolts, with the adc_scale of the current resolution cached by the UI
+    ecg_samples.append(ecg_mV)
+    ecg_processor.QRS_algorithm_interface(ecg_value)
+    heart_rate = ecg_processor.heart_rate
+    ir_ring[ring_idx] = ir_ring[ring_idx + BUFFER_SIZE] = ir_value
+    red_ring[ring_idx] = red_ring[ring_idx + BUFFER_SIZE] = red_value
+    ring_idx += 1
+    if ring_idx == BUFFER_SIZE:
+        ring_idx = 0
+        ring_full = True
+
+    # Update UI and record data
+    spo2_value = None
+    if ring_full:
+        # SpO2 changes far slower than the sample rate, so it is only estimated every SPO2_INTERVAL packets
+        spo2_countdown -= 1
+        if spo2_countdown <= 0:
+            spo2_countdown = SPO2_INTERVAL
+            # The views start at the oldest sample, the valley search depends on the sample order
+            last_spo2, last_spo2_heart_rate = spo2_estimator.estimate(ir_ring[ring_idx:ring_idx + BUFFER_SIZE],
+                                                                      red_ring[ring_idx:ring_idx + BUFFER_SIZE])
+            if 60 <= last_spo2_heart_rate <= 140:
+                ui.heart_rate_signal.emit(str(int(last_spo2_heart_rate)))  # Emit heart rate
+            if last_spo2 is not None:
+                spo2_text = f"SpO2: {last_spo2}%"
+            else:
+                spo2_text = "SpO2: N/A"
+            ui.spo2_update_signal.emit(spo2_text)
+        spo2_value, heart_rate = last_spo2, last_spo2_heart_rate
+    if ui.is_recording_data:
+        ui.record_data(ecg_mV, ir_value, red_value, spo2_value)
+
+    return ecg_mV
+
+
+def adc_scale(resolution_bits):
+    """
+    Returns the number of millivolts that one ADC step corresponds to.
 
     Parameters:
-    - adc_value: The digital value read from the ADC, which is to be converted to voltage.
-    - resolution_bits: The bit resolution of the ADC. This determines the number of discrete
-                       digital values that the ADC can output.
+    - resolution_bits: The bit resolution of the ADC.
 
     Returns:
-    - voltage_mv: The calculated voltage in millivolts corresponding to the adc_value.
-
-    The formula used for conversion is:
-        voltage = (adc_value / max_adc_value) * v_ref
-    where max_adc_value is derived from the resolution of the ADC (2^resolution_bits - 1),
-    and v_ref is the reference voltage for the ADC.
+    - The scale factor from ADC values to millivolts, v_ref / max_adc_value * 1000.
     """
     v_ref = 1.8  # Reference voltage for the ADC in volts
     max_adc_value = (1 << resolution_bits) - 1  # Calculates the maximum ADC value based on resolution
-    voltage = (adc_value / max_adc_value) * v_ref  # Converts the ADC value to a voltage
-    voltage_mv = voltage * 1000  # Convert voltage from volts to millivolts
-
-    return voltage_mv
-
+    return v_ref * 1000 / max_adc_value
@@ -13,7 +13,8 @@ given port, baud rate, and user interface.
 - start(self): This method starts the serial communication. It creates and starts a new thread to run the serial
 communication.
 
-- run(self): This method runs the serial communication. It reads and processes incoming data from the serial port.
+- run(self): This method runs the serial communication. It blocks on reads from the serial port with a short timeout
+and passes each read to process_data_bulk.
 
 - stop(self): This method stops the serial communication. It stops the running thread and closes the serial port.
 
@@ -24,12 +25,15 @@ To use this script, you need to create an instance of the SerialManager class, p
 and user interface to the constructor. Then, you can use the start method to start the serial communication,
 the stop method to stop it, and the update_port method to change the port."""
 # Import necessary libraries
+import logging
 import serial
 import threading
-import time
+from process_data import process_data_bulk
 
-# Define a global variable 'running' to control the running state of the serial communication
-running = False
+# Longest time a read blocks without data, bounds how long stop() waits for the thread to notice
+SERIAL_READ_TIMEOUT = 0.05
+
+log = logging.getLogger(__name__)
 
 
 # Define a class 'SerialManager' to manage serial communication
@@ -53,14 +57,14 @@ class SerialManager:
         self.ui = ui  # The user interface
         self.thread = None  # The thread for serial communication
         self.ser = None  # The serial communication object
+        self._stop = threading.Event()  # Set to ask the serial communication thread to end
 
     def start(self):
         """
                 Start the serial communication. It creates and starts a new thread to run the serial communication.
         """
-        global running
-        if not running:
-            running = True
+        if not (self.thread and self.thread.is_alive()):
+            self._stop.clear()
             # Create and start a new thread for serial communication
             self.thread = threading.Thread(target=self.run, name="SerialCommunicationThread")
             self.thread.daemon = True
@@ -71,31 +75,32 @@ class SerialManager:
         """
                 Run the serial communication. It reads and processes incoming data from the serial port.
         """
-        from process_data import process_data
-        while running:
+        while not self._stop.is_set():
             try:
                 # Create a new serial communication object with the given port and baud rate
-                with serial.Serial(self.port, self.baud_rate, timeout=1) as self.ser:
+                with serial.Serial(self.port, self.baud_rate, timeout=SERIAL_READ_TIMEOUT) as self.ser:
+                    try:
+                        # Push received bytes to the reader right away instead of on the tty flip-buffer work
+                        self.ser.set_low_latency_mode(True)
+                    except (AttributeError, OSError, ValueError):
+                        pass  # Not supported on this platform or driver
                     # Emit a signal indicating that the serial communication is connected
                     self.ui.serial_status_signal.emit(f"Serial connected on {self.port}", "green")
-                    while running:
-                        # If there is data waiting, read and process the data
-                        if self.ser.in_waiting:
-                            incoming_data = self.ser.read(self.ser.in_waiting)
-                            for byte in incoming_data:
-                                if self.ui.is_receiving_data:
-                                    if not self.ui.is_ble_connected:
-                                        process_data(byte, self.ui)
-                                    elif self.ui.is_ble_connected and not self.ui.using_ble:
-                                        process_data(byte, self.ui)
-                            if not running:
-                                self.ser.close()
-                        time.sleep(0.01)
+                    while not self._stop.is_set():
+                        # Block until data arrives or the timeout expires, then take everything already waiting
+                        incoming_data = self.ser.read(self.ser.in_waiting or 1)
+                        # Hand the whole read to the parser at once, packets may span several reads
+                        if incoming_data and self.ui.is_receiving_data:
+                            if not self.ui.is_ble_connected or not self.ui.using_ble:
+                                process_data_bulk(incoming_data, self.ui)
+                        if self._stop.is_set():
+                            self.ser.close()
 
             except serial.SerialException:
                 # If unable to connect to the serial communication, emit a signal
                 self.ui.serial_status_signal.emit("Serial not connected", "red")
-                time.sleep(5)
+                # Retry after 5 s, or end right away when stop() is called in the meantime
+                self._stop.wait(5.0)
             except Exception as e:
                 # If an error occurs during serial communication, print the error and emit a signal
                 print("Error during serial communication:", e)
@@ -110,8 +115,7 @@ class SerialManager:
         """
                 Stop the serial communication. It stops the running thread and closes the serial port.
         """
-        global running
-        running = False
+        self._stop.set()
         # Wait for the serial communication thread to end
         if self.thread and self.thread.is_alive():
             self.thread.join()
@@ -119,9 +123,9 @@ class SerialManager:
         if self.ser and self.ser.is_open:
             self.ser.close()
 
-        # Print the names of all currently active threads
-        for thread in threading.enumerate():
-            print(thread.name)
+        # Log the names of all currently active threads
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Active threads: %s", [thread.name for thread in threading.enumerate()])
 
     def update_port(self, new_port):
         """
@@ -130,9 +134,9 @@ class SerialManager:
                 Parameters:
                 - new_port: The new port for serial communication.
         """
-        # Print the names of all currently active threads
-        for thread in threading.enumerate():
-            print(thread.name)
+        # Log the names of all currently active threads
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Active threads: %s", [thread.name for thread in threading.enumerate()])
         # If the new port is different from the current port, stop the current serial communication and start a new
         # one with the new port
         if new_port != self.port:
@@ -10,10 +10,23 @@ SpO2 and heart rate.
 - estimate_spo2(pun_ir_buffer, pun_red_buffer): This function estimates the SpO2 and heart rate from the IR and RED
 signals. It first removes the DC components from the IR signal and then detects the valleys in the signal. It then
 calculates the ratio of the AC components of the RED and IR signals at the valleys and uses a lookup table to convert
-the ratio to SpO2."""
+the ratio to SpO2.
+
+- Spo2Estimator(buffer_size): Class doing the same estimate for windows of a fixed length through its estimate method,
+keeping the scratch buffers between calls instead of allocating them for every window.
+
+- _estimate_spo2_loops(ir, red, an_x, an_ir_valley_locs, an_ratio): Single pass loop version of the valley and ratio
+search, compiled with Numba when it is available."""
 
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional, estimate_spo2 uses vectorized NumPy without it
+    njit = None
+
+MA4_SIZE = 4  # Length of the moving average applied to the IR signal
+
 # Define the SpO2 lookup table
 uch_spo2_table = np.array([
     95, 95, 95, 96, 96, 96, 97, 97, 97, 97, 97, 98, 98, 98, 98, 98, 99, 99, 99, 99,
@@ -26,76 +39,229 @@ uch_spo2_table = np.array([
     49, 48, 47, 46, 45, 44, 43, 42, 41, 40, 39, 38, 37, 36, 35, 34, 33, 31, 30, 29,
     28, 27, 26, 25, 23, 22, 21, 20, 19, 17, 16, 15, 14, 12, 11, 10, 9, 7, 6, 5,
     3, 2, 1
-])
-
+], dtype=np.uint8)  # Every entry is a percentage, so one byte each
 
 
-def estimate_spo2(pun_ir_buffer, pun_red_buffer):
-    if len(pun_ir_buffer) == 0 or len(pun_red_buffer) == 0:
-        return None, None
+def _estimate_spo2_loops(ir, red, an_x, an_ir_valley_locs, an_ratio):
+    """
+    Loop version of the valley and ratio search in Spo2Estimator.estimate, fusing the per-stage NumPy passes so that
+    Numba compiles it into a few native loops without temporary arrays.
 
-    n_ir_buffer_length = len(pun_ir_buffer)
-    BUFFER_SIZE = n_ir_buffer_length
-    MA4_SIZE = 4
+    Parameters:
+    - ir: The IR samples as a float64 array.
+    - red: The red samples as a float64 array of the same length.
+    - an_x: Scratch float64 array of the same length for the filtered IR signal.
+    - an_ir_valley_locs: Scratch int64 array of the same length for the valley positions.
+    - an_ratio: Scratch float64 array of the same length for the RED/IR ratios.
 
-    an_x = np.zeros(BUFFER_SIZE)
-    an_y = np.zeros(BUFFER_SIZE)
+    Returns:
+    - n_npks: The number of valleys found.
+    - n_peak_interval_sum: The distance from the first to the last valley in samples.
+    - n_ratio_average: The median RED/IR ratio, 0 if no ratio could be computed.
+    - n_i_ratio_count: The number of valid ratios.
+    """
+    n = ir.shape[0]
 
-    # 计算红外平均并去直流分量
-    un_ir_mean = np.mean(pun_ir_buffer)
-    an_x = -1 * (pun_ir_buffer - un_ir_mean)
+    # 计算红外平均, the DC removal below needs the whole window's mean first
+    un_ir_mean = 0.0
+    for i in range(n):
+        un_ir_mean += ir[i]
+    un_ir_mean /= n
 
-    # 4点移动平均
-    for i in range(BUFFER_SIZE - MA4_SIZE):
-        an_x[i] = np.mean(an_x[i:i + MA4_SIZE])
+    # 去直流分量, 4点移动平均 and the threshold sum in one pass, n_d0 to n_d3 hold the latest DC removed samples
+    n_ma4 = n - MA4_SIZE
+    n_th1 = 0.0
+    n_d0 = n_d1 = n_d2 = 0.0
+    for i in range(n):
+        n_d3 = un_ir_mean - ir[i]
+        j = i - (MA4_SIZE - 1)
+        if 0 <= j < n_ma4:
+            an_x[j] = (n_d0 + n_d1 + n_d2 + n_d3) / MA4_SIZE
+            n_th1 += abs(an_x[j])
+        if i >= n_ma4:
+            an_x[i] = n_d3  # The last MA4_SIZE samples are not averaged
+        n_d0, n_d1, n_d2 = n_d1, n_d2, n_d3
 
-    # 计算阈值
-    n_th1 = np.mean(np.abs(an_x))
-    n_th1 = max(30, min(n_th1, 60))
+    # 计算阈值, adding the unaveraged samples last keeps the summation order of the separate passes
+    for i in range(max(n_ma4, 0), n):
+        n_th1 += abs(an_x[i])
+    n_th1 = max(30.0, min(n_th1 / n, 60.0))
 
-    # 使用峰值检测找到波谷
-    an_ir_valley_locs = []
-    for i in range(1, BUFFER_SIZE - 1):
+    # 寻找波谷
+    n_npks = 0
+    for i in range(1, n - 1):
         if an_x[i] < -n_th1 and an_x[i] < an_x[i - 1] and an_x[i] < an_x[i + 1]:
-            an_ir_valley_locs.append(i)
+            an_ir_valley_locs[n_npks] = i
+            n_npks += 1
 
-    n_npks = len(an_ir_valley_locs)
-    n_peak_interval_sum = np.diff(an_ir_valley_locs).sum() if n_npks >= 2 else 0
-    pn_heart_rate = (60 * 25) / n_peak_interval_sum if n_npks >= 2 else -999
-    pch_hr_valid = n_npks >= 2
+    # 使用波谷位置寻找IR和Red的AC和DC, one pass over each valley-to-valley segment
+    n_i_ratio_count = 0
+    for k in range(1, n_npks):
+        n_start = an_ir_valley_locs[k - 1]
+        n_end = an_ir_valley_locs[k]
+        n_x_dc_max = ir[n_start]
+        n_y_dc_max = red[n_start]
+        n_x_sum = 0.0
+        n_y_sum = 0.0
+        for j in range(n_start, n_end):
+            n_x_dc_max = max(n_x_dc_max, ir[j])
+            n_y_dc_max = max(n_y_dc_max, red[j])
+            n_x_sum += ir[j]
+            n_y_sum += red[j]
 
-    # 加载原始值以计算SPO2：红色和红外
-    an_x = pun_ir_buffer
-    an_y = pun_red_buffer
+        n_nume = (n_y_dc_max - n_y_sum / (n_end - n_start)) * n_x_dc_max
+        n_denom = (n_x_dc_max - n_x_sum / (n_end - n_start)) * n_y_dc_max
+        if n_denom > 0:
+            an_ratio[n_i_ratio_count] = 100 * n_nume / n_denom
+            n_i_ratio_count += 1
 
-    # 使用波谷位置寻找IR和Red的AC和DC
+    # 使用中值获取R值
     n_ratio_average = 0
-    n_i_ratio_count = 0
-    an_ratio = np.zeros(200)
+    if n_i_ratio_count > 0:
+        n_middle_idx = n_i_ratio_count // 2
+        n_ratio_average = int(np.partition(an_ratio[:n_i_ratio_count], n_middle_idx)[n_middle_idx])
 
-    for k in range(1, n_npks):
-        if an_ir_valley_locs[k] < BUFFER_SIZE:
-            n_x_dc_max = np.max(an_x[an_ir_valley_locs[k - 1]:an_ir_valley_locs[k]])
-            n_y_dc_max = np.max(an_y[an_ir_valley_locs[k - 1]:an_ir_valley_locs[k]])
+    n_peak_interval_sum = an_ir_valley_locs[n_npks - 1] - an_ir_valley_locs[0] if n_npks >= 2 else 0
+    return n_npks, n_peak_interval_sum, n_ratio_average, n_i_ratio_count
 
-            n_x_ac = n_x_dc_max - np.mean(an_x[an_ir_valley_locs[k - 1]:an_ir_valley_locs[k]])
-            n_y_ac = n_y_dc_max - np.mean(an_y[an_ir_valley_locs[k - 1]:an_ir_valley_locs[k]])
 
-            n_nume = n_y_ac * n_x_dc_max
-            n_denom = n_x_ac * n_y_dc_max
+# The plain Python loops are slower than the vectorized NumPy path, so they are only used once compiled
+estimate_spo2_loops = njit(cache=True)(_estimate_spo2_loops) if njit is not None else None
 
-            if n_denom > 0:
-                an_ratio[n_i_ratio_count] = 100 * n_nume / n_denom
-                n_i_ratio_count += 1
 
-    # 使用中值获取R值
-    if n_i_ratio_count > 0:
-        an_ratio = an_ratio[:n_i_ratio_count]
-        an_ratio.sort()
-        n_middle_idx = n_i_ratio_count // 2
-        n_ratio_average = int(an_ratio[n_middle_idx])
-        pn_spo2 = uch_spo2_table[n_ratio_average] if 2 < n_ratio_average < 183 else None
-    else:
-        pn_spo2 = None
+class Spo2Estimator:
+    """
+    Class to estimate SpO2 and heart rate from windows of a fixed length, reusing its scratch buffers between calls.
+    """
+
+    def __init__(self, buffer_size):
+        """
+        Initialize the Spo2Estimator.
+
+        Parameters:
+        - buffer_size: The number of samples in every IR and red window passed to estimate.
+        """
+        self.buffer_size = buffer_size
+        self.an_ir = np.empty(buffer_size)  # Float64 copies of the inputs for the compiled loops
+        self.an_red = np.empty(buffer_size)
+        self.an_x = np.empty(buffer_size)  # DC removed and averaged IR signal
+        self.an_scratch = np.empty(buffer_size)  # MA4 partial sums, then |an_x| for the threshold
+        self.an_valley_mask = np.empty(max(buffer_size - 2, 0), dtype=bool)
+        self.an_cmp = np.empty(max(buffer_size - 2, 0), dtype=bool)
+        self.an_ir_valley_locs = np.empty(buffer_size, dtype=np.int64)
+        self.an_ratio = np.empty(buffer_size)
+
+    def estimate(self, pun_ir_buffer, pun_red_buffer):
+        """
+        Estimate SpO2 and heart rate from one window of IR and red samples.
+
+        Parameters:
+        - pun_ir_buffer: The IR samples, buffer_size values oldest first.
+        - pun_red_buffer: The red samples, buffer_size values oldest first.
+
+        Returns:
+        - pn_spo2: The SpO2 percentage, None if it could not be estimated.
+        - pn_heart_rate: The heart rate from the IR valleys, -999 if fewer than two valleys were found.
+        """
+        if len(pun_ir_buffer) == 0 or len(pun_red_buffer) == 0:
+            return None, None
+
+        if estimate_spo2_loops is not None:
+            self.an_ir[:] = pun_ir_buffer
+            self.an_red[:] = pun_red_buffer
+            n_npks, n_peak_interval_sum, n_ratio_average, n_i_ratio_count = estimate_spo2_loops(
+                self.an_ir, self.an_red, self.an_x, self.an_ir_valley_locs, self.an_ratio)
+            pn_heart_rate = (60 * 25) / n_peak_interval_sum if n_npks >= 2 else -999
+            if n_i_ratio_count > 0:
+                pn_spo2 = uch_spo2_table[n_ratio_average] if 2 < n_ratio_average < 183 else None
+            else:
+                pn_spo2 = None
+            return pn_spo2, pn_heart_rate
+
+        BUFFER_SIZE = self.buffer_size
+        an_x = self.an_x
+        an_scratch = self.an_scratch
+
+        # 计算红外平均并去直流分量, negated in the same subtraction
+        un_ir_mean = np.mean(pun_ir_buffer)
+        np.subtract(un_ir_mean, pun_ir_buffer, out=an_x)
+
+        # 4点移动平均, summed in the same order as np.mean so the result is unchanged
+        n_ma4 = BUFFER_SIZE - MA4_SIZE
+        if n_ma4 > 0:
+            an_sum = an_scratch[:n_ma4]
+            np.add(an_x[:n_ma4], an_x[1:n_ma4 + 1], out=an_sum)
+            an_sum += an_x[2:n_ma4 + 2]
+            an_sum += an_x[3:n_ma4 + 3]
+            np.divide(an_sum, MA4_SIZE, out=an_x[:n_ma4])
+
+        # 计算阈值
+        n_th1 = np.mean(np.abs(an_x, out=an_scratch))
+        n_th1 = max(30, min(n_th1, 60))
+
+        # 使用峰值检测找到波谷
+        an_mid = an_x[1:-1]
+        an_valley_mask = self.an_valley_mask
+        an_cmp = self.an_cmp
+        np.less(an_mid, -n_th1, out=an_valley_mask)
+        an_valley_mask &= np.less(an_mid, an_x[:-2], out=an_cmp)
+        an_valley_mask &= np.less(an_mid, an_x[2:], out=an_cmp)
+        an_ir_valley_locs = np.flatnonzero(an_valley_mask) + 1
+
+        n_npks = len(an_ir_valley_locs)
+        n_peak_interval_sum = np.diff(an_ir_valley_locs).sum() if n_npks >= 2 else 0
+        pn_heart_rate = (60 * 25) / n_peak_interval_sum if n_npks >= 2 else -999
+        pch_hr_valid = n_npks >= 2
+
+        # 加载原始值以计算SPO2：红色和红外
+        an_x = pun_ir_buffer
+        an_y = pun_red_buffer
+
+        # 使用波谷位置寻找IR和Red的AC和DC, one reduction per signal over all valley-to-valley segments
+        n_ratio_average = 0
+        if n_npks >= 2:
+            an_seg_starts = an_ir_valley_locs[:-1]
+            n_seg_end = an_ir_valley_locs[-1]
+            an_seg_lens = np.diff(an_ir_valley_locs)
+
+            an_x_dc_max = np.maximum.reduceat(an_x[:n_seg_end], an_seg_starts)
+            an_y_dc_max = np.maximum.reduceat(an_y[:n_seg_end], an_seg_starts)
+
+            an_x_ac = an_x_dc_max - np.add.reduceat(an_x[:n_seg_end], an_seg_starts, dtype=np.float64) / an_seg_lens
+            an_y_ac = an_y_dc_max - np.add.reduceat(an_y[:n_seg_end], an_seg_starts, dtype=np.float64) / an_seg_lens
+
+            an_nume = an_y_ac * an_x_dc_max
+            an_denom = an_x_ac * an_y_dc_max
+
+            # Divide every segment and keep the positive denominators, the rejected ones may divide by zero
+            with np.errstate(divide='ignore', invalid='ignore'):
+                an_ratio = 100 * an_nume / an_denom
+            an_ratio = an_ratio[an_denom > 0]
+        else:
+            an_ratio = np.empty(0)
+        n_i_ratio_count = len(an_ratio)
+
+        # 使用中值获取R值
+        if n_i_ratio_count > 0:
+            n_middle_idx = n_i_ratio_count // 2
+            n_ratio_average = int(np.partition(an_ratio, n_middle_idx)[n_middle_idx])  # Only the median is needed
+            pn_spo2 = uch_spo2_table[n_ratio_average] if 2 < n_ratio_average < 183 else None
+        else:
+            pn_spo2 = None
+
+        return pn_spo2, pn_heart_rate
+
+
+def estimate_spo2(pun_ir_buffer, pun_red_buffer):
+    """
+    Estimate SpO2 and heart rate from a single window, for callers without a Spo2Estimator of their own.
+
+    Parameters:
+    - pun_ir_buffer: The IR samples, oldest first.
+    - pun_red_buffer: The red samples, oldest first.
 
-    return pn_spo2, pn_heart_rate
+    Returns:
+    - pn_spo2: The SpO2 percentage, None if it could not be estimated.
+    - pn_heart_rate: The heart rate from the IR valleys, -999 if fewer than two valleys were found.
+    """
+    return Spo2Estimator(len(pun_ir_buffer)).estimate(pun_ir_buffer, pun_red_buffer)